@@ -15,11 +15,9 @@
 #
 # =============================================================
 
-import heapq
 from bid import Bid
 
 TICK_SIZE = 0.01                 # Smallest discrete unit of price
-TIME = 0                         # Allows the bids/asks to be ordered chronologically
 
 
 class Agent:
@@ -65,80 +63,70 @@ class Agent:
         new_belief = old_belief / (old_belief + adjusted_bayes_factor*(1-old_belief))
         self.belief = new_belief
     
-    def for_main(self, bids_for, bids_against, market_price):
+    def for_main(self, book, market_price):
         """ Checks if the agents want to buy contracts for the
             positive outcome ('FOR') and stacks bids.
             FOR contracts cost (market_price).
                 
             Args:
-                bids_for: List of stacked Bids for contracts
-                    for the positive outcome.
-                bids_against: List of stacked Bids for contracts
-                    for the negative outcome.
+                book: OrderBook holding the stacked Bids for
+                    both outcomes.
                 market_price: The current price of the contracts.
                 """
-        max_for = heapq.nsmallest(1, bids_for)
-        max_against = heapq.nsmallest(1, bids_against)
+        max_for = book.best_for()
+        max_against = book.best_against()
         buy_price = 1
 
-        if max_for == []:                                                                       # No positive Bids have been placed yet.
-            if max_against == []:                                                               # No negative Bids have been placed yet.
+        if max_for is None:                                                                     # No positive Bids have been placed yet.
+            if max_against is None:                                                             # No negative Bids have been placed yet.
                 buy_price = market_price + TICK_SIZE
             else:
-                buy_price = 1 - max_against[0].price                                            # Offer to buy at the cheapest price.
+                buy_price = 1 - max_against.price                                               # Offer to buy at the cheapest price.
         else:
-            buy_price = max_for[0].price + TICK_SIZE                                            # Offer to buy at TICK_SIZE more than the next highest Bid.
+            buy_price = max_for.price + TICK_SIZE                                               # Offer to buy at TICK_SIZE more than the next highest Bid.
             
         n_would_like_to_buy = int((self.belief-buy_price)*100*self.risk_factor)                 # Determine number of contract to buy with risk_factor
         n_can_buy = int(self.wealth/buy_price) + self.n_contracts_against
         n_will_buy = min(n_would_like_to_buy, n_can_buy)
         
-        while n_will_buy > 0:                                                                   # Place Bids for contracts.
-            self.place_bid_for(bids_for, buy_price)
-            n_will_buy -= 1
+        if n_will_buy > 0:                                                                      # Place a single Bid for all the contracts.
+            self.place_bid_for(book, buy_price, n_will_buy)
     
-    def against_main(self, bids_for, bids_against, market_price):
+    def against_main(self, book, market_price):
         """ Checks if the agents want to buy contracts for the
             negative outcome ('AGAINST') and stacks bids. 
             AGAINST contracts cost (1 - market_price).
                 
             Args:
-                bids_for: List of stacked Bids for contracts
-                    for the positive outcome.
-                bids_against: List of stacked Bids for contracts
-                    for the negative outcome.
+                book: OrderBook holding the stacked Bids for
+                    both outcomes.
                 market_price: The current price of the contracts.
                 """
-        max_for = heapq.nsmallest(1, bids_for)
-        max_against = heapq.nsmallest(1, bids_against)
+        max_for = book.best_for()
+        max_against = book.best_against()
         buy_price = 1
         against_belief = 1-self.belief 
         
-        if max_against == []:                                                                   # No positive Bids have been placed yet.
-            if max_for == []:                                                                   # No negative Bids have been placed yet.
+        if max_against is None:                                                                 # No positive Bids have been placed yet.
+            if max_for is None:                                                                 # No negative Bids have been placed yet.
                 buy_price = (1-market_price) + TICK_SIZE
             else:
-                buy_price = 1 - max_for[0].price                                                # Offer to buy at cheapest price.
+                buy_price = 1 - max_for.price                                                   # Offer to buy at cheapest price.
         else:
-            buy_price = max_against[0].price
+            buy_price = max_against.price
             buy_price += TICK_SIZE                                                              # Offer to buy at TICK_SIZE more than highest bid.
             
         n_would_like_to_buy = int((against_belief-buy_price)*100*self.risk_factor)              # Determine number of contract to buy with risk_factor
         n_can_buy = int(self.wealth/buy_price) + self.n_contracts_for
         n_will_buy = min(n_would_like_to_buy, n_can_buy)
 
-        while n_will_buy > 0:                                                                   # Place Bids for contracts.
-            self.place_bid_against(bids_against, buy_price)
-            n_will_buy -= 1
+        if n_will_buy > 0:                                                                      # Place a single Bid for all the contracts.
+            self.place_bid_against(book, buy_price, n_will_buy)
 
-    def place_bid_for(self, bids_for, bidding_price):
-        global TIME
-        new_bid = Bid("FOR", bidding_price, TIME, self.ID)
-        heapq.heappush(bids_for, new_bid)
-        TIME += 1                                                                               # Increment the time every time a bid/ask is placed
+    def place_bid_for(self, book, bidding_price, quantity=1):
+        new_bid = Bid("FOR", bidding_price, next(book.clock), self.ID, quantity)
+        return book.push(new_bid)
     
-    def place_bid_against(self, bids_against, bidding_price):
-        global TIME
-        new_bid = Bid("AGAINST", bidding_price, TIME, self.ID)
-        heapq.heappush(bids_against, new_bid)
-        TIME += 1                                                                               # Increment the time every time a bid/ask is placed
\ No newline at end of file
+    def place_bid_against(self, book, bidding_price, quantity=1):
+        new_bid = Bid("AGAINST", bidding_price, next(book.clock), self.ID, quantity)
+        return book.push(new_bid)
\ No newline at end of file
@@ -0,0 +1,121 @@
+# ============================================================
+# Prediction Market Simulation - Call Auction
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# In the call auction mode all the agents submit their Bids for
+# the cycle and the market clears once, at the single price
+# where the FOR demand meets the AGAINST demand. Both demands are
+# cumulative sums over the price levels of the order book.
+#
+# =============================================================
+
+import numpy as np
+from agent import TICK_SIZE
+from orderbook import N_LEVELS
+from matching import FillReport
+
+
+def clearing_tick(book):
+    """ Finds the uniform clearing price of the book.
+
+        A Bid FOR at level t buys at any FOR price up to t; a Bid
+        AGAINST at level a buys at any FOR price down to 1 - a.
+        The clearing price maximizes the number of contracts traded,
+        taking the middle of the range of such prices.
+
+        Returns:
+            The price level of the FOR contracts and the number of
+                contracts traded at that price, 0 if the book doesn't cross.
+        """
+    demand_for = np.cumsum(book.quantity["FOR"][::-1])[::-1]                                    # Contracts bid FOR at a price >= t.
+    demand_against = np.cumsum(book.quantity["AGAINST"][::-1])                                  # Contracts bid AGAINST at a price >= 1 - t.
+    volume = np.minimum(demand_for, demand_against)
+    max_volume = int(volume.max())
+    if max_volume == 0:
+        return None, 0
+    ticks = np.flatnonzero(volume == max_volume)
+    return int(ticks[len(ticks) // 2]), max_volume
+
+
+def remove_unaffordable(book, market, tick):
+    """ Reduces the quantity of the Bids that could trade at the FOR
+        price level tick to what their agents can afford, removing the
+        Bids of agents who can't pay. Bids are considered in priority
+        order and every agent's wealth is shared by all its Bids.
+
+        Returns:
+            True if any Bid was changed.
+        """
+    residual = {}                                                                               # agent_id -> [wealth, n_contracts_for, n_contracts_against]
+    changed = False
+    for type_bid, lowest_tick in (("FOR", tick), ("AGAINST", N_LEVELS - 1 - tick)):
+        opposite = 2 if type_bid == "FOR" else 1
+        for level in range(N_LEVELS - 1, lowest_tick - 1, -1):
+            queue = book.queues[type_bid][level]
+            if not queue:
+                continue
+            kept = []
+            level_changed = False
+            for bid in queue:
+                if bid.agent_id not in residual:
+                    agent = market.all_agents[bid.agent_id]
+                    residual[bid.agent_id] = [agent.wealth, agent.n_contracts_for, agent.n_contracts_against]
+                state = residual[bid.agent_id]
+                n_affordable = state[opposite] + int((state[0] + state[opposite]*(1-bid.price))/bid.price)
+                quantity = min(bid.quantity, max(n_affordable, 0))
+                n_paired = min(quantity, state[opposite])
+                state[0] += n_paired*(1-bid.price) - (quantity-n_paired)*bid.price
+                state[opposite] -= n_paired
+                if quantity < bid.quantity:
+                    level_changed = True
+                    bid.quantity = quantity
+                if quantity > 0:
+                    kept.append(bid)
+            if level_changed:
+                book.set_level(type_bid, level, kept)
+                changed = True
+    return changed
+
+
+def clear_call_auction(book, market):
+    """Performs the transactions of a uniform-price call auction.
+
+    Every crossing Bid trades at the clearing price, in price and time
+    priority, as long as contracts are left on the other side.
+
+    Args:
+        book: OrderBook holding the bids for contracts paying for
+            positive and negative outcome.
+        market: The Market object to perform the transactions in.
+
+    Returns:
+        A FillReport summarizing the trades, counting every Bid filled.
+    """
+    tick, volume = clearing_tick(book)
+    while volume > 0 and book.escrow is None and remove_unaffordable(book, market, tick):
+        tick, volume = clearing_tick(book)
+    if volume == 0:
+        return FillReport(0, 0, None)
+
+    price = tick * TICK_SIZE
+    count = 0
+    for type_bid in ("FOR", "AGAINST"):
+        remaining = volume
+        while remaining > 0:
+            bid = book.peek(type_bid)
+            quantity = min(bid.quantity, remaining)
+            book.fill(type_bid, quantity)
+            if type_bid == "FOR":
+                market.buy_for(bid.agent_id, price, quantity)
+            else:
+                market.buy_against(bid.agent_id, price, quantity)
+            remaining -= quantity
+            count += 1
+
+    market.market_price = price
+    return FillReport(count, volume, price)
@@ -20,15 +20,21 @@ class Bid:
             the transaction.
         age: The TIME value to sort the Bids chronologically.
         agent_id: Agent.ID value for the bidding agent.
+        quantity: The number of contracts still to be bought
+            by the bid.
+        reserved: The number of contracts backed by funds held
+            in escrow, see Escrow.
         priority: Value needed for heapq to sort the heap by 
             price.
     """
     def __lt__(self, other):
         return self.priority < other.priority
     
-    def __init__(self, type_bid, price, age, agent_id):
+    def __init__(self, type_bid, price, age, agent_id, quantity=1):
         self.type_bid = type_bid
         self.price = price
         self.age = age
         self.agent_id = agent_id
+        self.quantity = quantity
+        self.reserved = 0
         self.priority = price * -1
\ No newline at end of file
@@ -0,0 +1,97 @@
+# ============================================================
+# Prediction Market Simulation - Result Cache
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# The result cache persists the result of every job of a sweep
+# as soon as it completes, in its own file named after a stable
+# hash of the function, its arguments and its seed. A sweep
+# interrupted or extended with new cells only runs the jobs
+# whose result is not on disk yet. A sweep without a seed uses
+# the root entropy recorded in the cache by its first run.
+#
+# =============================================================
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import numpy as np
+
+
+def to_json(value):
+    """Converts the values json can't serialize, see job_key."""
+    if isinstance(value, np.random.SeedSequence):
+        return {"entropy": value.entropy, "spawn_key": list(value.spawn_key)}
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
+
+
+def job_key(function, args):
+    """Returns the hexadecimal hash identifying the result of function(*args).
+
+    The hash only depends on the name of the function and on the values
+    of the arguments, so it is the same in every process and every run.
+    """
+    description = {"function": "{}.{}".format(function.__module__, function.__qualname__),
+                   "args": list(args)}
+    encoded = json.dumps(description, sort_keys=True, default=to_json)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResultCache:
+    """ Class representing a directory of job results.
+
+    Attributes:
+        directory: Path of the directory holding one pickle file per result.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def root_seed(self, seed=None):
+        """Returns seed, or if it is None the root entropy of the sweeps
+        using this cache, drawn and recorded on first use."""
+        if seed is not None:
+            return seed
+        path = os.path.join(self.directory, "root_entropy.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        entropy = np.random.SeedSequence().entropy
+        with open(path, "w") as f:
+            json.dump(entropy, f)
+        return entropy
+
+    def path(self, key):
+        """Returns the path of the file of the result of key."""
+        return os.path.join(self.directory, key[:2], key + ".pkl")
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def load(self, key):
+        """Returns the result stored under key."""
+        with open(self.path(key), "rb") as f:
+            return pickle.load(f)
+
+    def store(self, key, result):
+        """Stores result under key. The file is written under a temporary
+        name and renamed, so a crash never leaves a truncated result."""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
@@ -0,0 +1,131 @@
+# ============================================================
+# Prediction Market Simulation - Engine
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# The engine is the importable core of the simulation. It only
+# depends on NumPy: plotting (matplotlib) and result tables
+# (pandas) are imported lazily by the scripts that need them,
+# so worker processes of the sweeps start quickly.
+#
+# =============================================================
+
+from collections import namedtuple
+import numpy as np
+from agent import Agent
+from ensemble import Ensemble
+from god import God
+from market import Market
+from orderbook import OrderBook
+from simulation import Simulation
+
+SimulationParams = namedtuple("SimulationParams", [
+    "n_agents",                         # Number of the agents particecipating in the system.
+    "max_iter",                         # Number of cycles of the market, every agent performs an action in each cycle.
+    "n_evidence",                       # How many times a piece of information is shared with a percentage of the population.
+    "fraction_receiving_evidence",      # Percentage of agents who receive information when it is introduced.
+    "fraction_extra_time",              # Fraction of the total number of cycles the agents keep on trading after the last piece of information.
+    "risk_factor",                      # Used to determine how many contracts an agent buys when it expects to profit.
+    "trust",                            # How much the agents trust the market price as an indicator of probability of the event.
+    "wealth",                           # Units of currency every agent is initialized with.
+    "population",                       # Whether the agents are stored in an AgentPopulation of NumPy arrays.
+    "log_odds",                         # Whether the beliefs are stored as log-odds.
+    "clearing",                         # 'continuous' double auction or one uniform-price 'call' auction per cycle.
+    "mechanism",                        # 'cda' to trade through the order book, 'lmsr' to trade against a market maker.
+    "liquidity",                        # Liquidity parameter b of the LMSR market maker.
+    "two_phase",                        # Whether all the bids of a cycle are computed from a snapshot, then matched once.
+    "order_ttl",                        # Number of cycles a bid rests in the book before expiring, None if bids never expire.
+    "max_orders_per_agent",             # Maximum number of bids an agent can keep resting in the book, None for no limit.
+    "requote",                          # Whether every agent cancels its resting bids before placing new ones.
+    "escrow",                           # Whether the book reserves the funds backing every bid, so matching needs no solvency check.
+    "p_AgivenE",                        # Likelihood of the evidence A given the event, how informative every piece of evidence is.
+    "common_random_numbers",            # Whether beliefs, evidence, recipients and agent order are drawn from separate streams of the seed.
+], defaults=[50, 100, 20, 0.33, 0.10, 0.3, 0.3, 100, False, False, "continuous", "cda", 20, False, None, None, False, False, 0.6, False])
+
+SimulationResult = namedtuple("SimulationResult", ["price_history", "god_history", "correlation", "difference"])
+SimulationResult.__doc__ = """ Outcome of a single run of the simulation.
+
+    Attributes:
+        price_history: Market price at the end of every cycle.
+        god_history: God's belief at the end of every cycle.
+        correlation: Correlation of price_history and god_history.
+        difference: God's final belief minus the final market price.
+    """
+
+
+def check_params(params):
+    """Raises a ValueError if params holds invalid arguments."""
+    if (params.risk_factor <= 0.0):
+        raise ValueError("Invalid Argument for RISK_FACTOR: must be more than 0.0.")
+    if (params.trust > 1.0 or params.trust < 0.0):
+        raise ValueError("Invalid Argument for TRUST: must be in range [0.0, 1.0].")
+    if (params.order_ttl is not None and params.order_ttl < 1):
+        raise ValueError("Invalid Argument for ORDER_TTL: must be at least 1.")
+    if (params.max_orders_per_agent is not None and params.max_orders_per_agent < 1):
+        raise ValueError("Invalid Argument for MAX_ORDERS_PER_AGENT: must be at least 1.")
+    if (params.p_AgivenE >= 1.0 or params.p_AgivenE <= 0.0):
+        raise ValueError("Invalid Argument for P_AGIVENE: must be in range (0.0, 1.0).")
+
+
+def make_simulation(params, seed=None):
+    """Returns a Simulation of the given SimulationParams, or dictionary
+    of its fields, whose random generator is seeded with seed."""
+    if isinstance(params, dict):
+        params = SimulationParams(**params)
+    check_params(params)
+    return Simulation(params.n_agents, params.max_iter, params.n_evidence, params.fraction_receiving_evidence,
+                      params.fraction_extra_time, params.risk_factor, params.trust, params.wealth,
+                      seed=seed, population=params.population, log_odds=params.log_odds, clearing=params.clearing,
+                      mechanism=params.mechanism, liquidity=params.liquidity, two_phase=params.two_phase,
+                      order_ttl=params.order_ttl, max_orders_per_agent=params.max_orders_per_agent,
+                      requote=params.requote, escrow=params.escrow, p_AgivenE=params.p_AgivenE,
+                      common_random_numbers=params.common_random_numbers)
+
+
+def run_simulation(params, seed=None):
+    """Runs a complete simulation.
+
+    Args:
+        params: SimulationParams, or dictionary of its fields.
+        seed: Seed of the random generator of the simulation.
+
+    Returns:
+        The SimulationResult of the run.
+    """
+    simulation = make_simulation(params, seed)
+    price_history, god_history = simulation.run()
+    correlation = np.min(np.corrcoef(price_history, god_history))
+    difference = simulation.god.belief - simulation.market.market_price
+    return SimulationResult(price_history, god_history, correlation, difference)
+
+
+def run_ensemble(params, n_replications, seed=None):
+    """Runs n_replications simulations in lockstep with an Ensemble.
+
+    Args:
+        params: SimulationParams, or dictionary of its fields. The
+            population, log_odds, clearing, mechanism, liquidity,
+            two_phase, order_ttl, max_orders_per_agent, requote and escrow
+            fields are ignored.
+        n_replications: Number of replications.
+        seed: Seed of the random generator of the ensemble.
+
+    Returns:
+        The list of the SimulationResult of every replication.
+    """
+    if isinstance(params, dict):
+        params = SimulationParams(**params)
+    check_params(params)
+    ensemble = Ensemble(n_replications, params.n_agents, params.max_iter, params.n_evidence,
+                        params.fraction_receiving_evidence, params.fraction_extra_time,
+                        params.risk_factor, params.trust, params.wealth, seed=seed, p_AgivenE=params.p_AgivenE,
+                        common_random_numbers=params.common_random_numbers)
+    price_history, god_history = ensemble.run()
+    difference = ensemble.god_belief - ensemble.market_price()
+    return [SimulationResult(list(price_history[r]), list(god_history[r]),
+                             np.min(np.corrcoef(price_history[r], god_history[r])), difference[r])
+            for r in range(n_replications)]
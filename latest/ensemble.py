@@ -0,0 +1,221 @@
+# ============================================================
+# Prediction Market Simulation - Ensemble
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# An ensemble advances many replications of the same
+# simulation in lockstep. The state of the agents is kept in
+# 2-D arrays (replication x agent), so evidence delivery,
+# learning from the market and bid sizing are single NumPy
+# calls across all the replications. Every replication keeps
+# its own order book and market, so placing the bids and matching
+# them remain Python loops over the replications: running an
+# ensemble is about as fast as running its replications one
+# after the other, and a sweep parallelizes better over single
+# replications. The ensemble is a convenient way to hold the
+# state of many replications in the same arrays.
+#
+# =============================================================
+
+import itertools
+import numpy as np
+from god import God
+from market import Market
+from orderbook import OrderBook
+from population import AgentPopulation
+from matching import transact
+from agent import TICK_SIZE
+from orders import book_top_price, quote
+from simulation import random_streams
+
+
+class Ensemble:
+    """ Class representing R replications of the prediction market.
+
+    Attributes:
+        streams: Dictionary name -> numpy.random.Generator of the random
+            streams of the runs, see simulation.random_streams.
+        rng: numpy.random.Generator drawing the order of the agents.
+        clock: Iterator yielding the TIME values of the bids, in order.
+        n_replications: Number R of replications.
+        max_iter: Number of cycles of the market.
+        evidence_time: Number of cycles during which evidence is provided.
+        iters_per_evidence: Number of cycles between two pieces of evidence.
+        n_receiving_evidence: Number of agents receiving every piece of evidence.
+        god: God holding the probabilities of the evidence.
+        god_belief: Array of God's belief in every replication.
+        belief, risk_factor, trust, wealth, n_contracts_for, n_contracts_against:
+            R x N arrays with the state of every agent of every replication.
+        markets: Market of every replication, storing a row of the arrays.
+        books: OrderBook of every replication.
+        best_for, best_against: Arrays of the highest price bid for the
+            FOR and AGAINST contracts in the book of every replication,
+            NaN if that side is empty. Refreshed after every change of a book.
+        prices: Array of the market price of every replication.
+        old_market_price: Array of the market prices at the previous piece
+            of evidence, None before the first one.
+        iteration: Number of completed market cycles.
+        price_history: R x max_iter array of the market prices.
+        god_history: R x max_iter array of God's beliefs.
+    """
+
+    def __init__(self, n_replications, n_agents, max_iter, n_evidence, fraction_receiving_evidence,
+                 fraction_extra_time, risk_factor, trust, wealth, seed=None, p_AgivenE=0.6,
+                 common_random_numbers=False):
+        """ Initialize the ensemble, see Simulation for the arguments.
+
+        Args:
+            n_replications: Number of replications advanced together.
+        """
+        self.streams = random_streams(seed, common_random_numbers)
+        self.rng = self.streams["ordering"]
+        self.clock = itertools.count()
+        self.n_replications = n_replications
+        self.max_iter = max_iter
+        self.evidence_time = int((1-fraction_extra_time)*max_iter)
+        self.iters_per_evidence = np.round(self.evidence_time/n_evidence)
+        self.n_receiving_evidence = int(n_agents * fraction_receiving_evidence)
+
+        shape = (n_replications, n_agents)
+        self.god = God(p_AgivenE, 1-p_AgivenE, n_agents, rng=self.streams["evidence"],
+                       recipients_rng=self.streams["recipients"])
+        self.god_belief = np.full(n_replications, self.god.belief)
+        self.belief = self.streams["beliefs"].uniform(low=0.05, high=0.95, size=shape)
+        self.risk_factor = np.full(shape, risk_factor, dtype=np.float64)
+        self.trust = np.full(shape, trust, dtype=np.float64)
+        self.wealth = np.full(shape, wealth, dtype=np.float64)
+        self.n_contracts_for = np.zeros(shape, dtype=np.int64)
+        self.n_contracts_against = np.zeros(shape, dtype=np.int64)
+
+        self.markets = [Market.from_population(AgentPopulation.from_arrays(
+                            self.belief[r], self.risk_factor[r], self.trust[r], self.wealth[r],
+                            self.n_contracts_for[r], self.n_contracts_against[r]))
+                        for r in range(n_replications)]
+        self.books = [OrderBook(self.clock) for _ in range(n_replications)]
+        self.best_for = np.full(n_replications, np.nan)
+        self.best_against = np.full(n_replications, np.nan)
+        self.prices = np.array([market.market_price for market in self.markets], dtype=np.float64)
+        self.old_market_price = None
+
+        self.iteration = 0
+        self.price_history = np.empty((n_replications, max_iter))
+        self.god_history = np.empty((n_replications, max_iter))
+
+    def market_price(self):
+        """Returns the array of the market prices of every replication."""
+        return self.prices.copy()
+
+    def refresh(self, rows):
+        """Updates best_for, best_against and prices for the replications
+        in rows, whose books or markets have changed."""
+        for r in rows:
+            self.best_for[r] = book_top_price(self.books[r].best_for())
+            self.best_against[r] = book_top_price(self.books[r].best_against())
+            self.prices[r] = self.markets[r].market_price
+
+    def learn_from_market(self):
+        """Updates the beliefs of the agents of every replication, see
+        simulation.learn_from_market."""
+        if self.old_market_price is None:
+            return
+        new_price = self.market_price()
+        bayes_factor = (self.old_market_price*(1-new_price))/(new_price*(1-self.old_market_price))
+        adjusted_bayes_factor = (self.trust*bayes_factor[:, None]) + (1-self.trust)
+        self.belief /= self.belief + adjusted_bayes_factor*(1-self.belief)
+
+    def update_universe(self):
+        """Draws a piece of evidence for every replication, updates God's
+        belief and the beliefs of the agents receiving it, see God.update_universe."""
+        is_A = self.streams["evidence"].uniform(0, 1, size=self.n_replications) < self.god.p_A
+        p_given_E = np.where(is_A, self.god.p_AgivenE, self.god.p_BgivenE)
+        p_given_notE = np.where(is_A, self.god.p_Agiven_notE, self.god.p_Bgiven_notE)
+        self.god_belief = (self.god_belief * p_given_E) / ((self.god_belief * p_given_E) + ((1-self.god_belief) * p_given_notE))
+
+        # select a random set of agents of every replication to receive evidence, without replacement
+        n_agents = self.belief.shape[1]
+        if self.n_receiving_evidence == 0:
+            return
+        if self.n_receiving_evidence < n_agents:
+            chosen_ones = np.argpartition(self.streams["recipients"].random(self.belief.shape), self.n_receiving_evidence, axis=1)[:, :self.n_receiving_evidence]
+        else:
+            chosen_ones = np.broadcast_to(np.arange(n_agents), self.belief.shape)
+        rows = np.arange(self.n_replications)[:, None]
+        old_belief = self.belief[rows, chosen_ones]
+        self.belief[rows, chosen_ones] = (old_belief * p_given_E[:, None]) / ((old_belief * p_given_E[:, None]) + ((1-old_belief) * p_given_notE[:, None]))
+
+    def place_bids(self, agent_ids, type_bid):
+        """Places the Bids of type type_bid of one agent of every replication.
+
+        Returns:
+            The boolean array of the replications where a Bid was placed.
+        """
+        rows = np.arange(self.n_replications)
+        best_for = self.best_for
+        best_against = self.best_against
+        market_price = self.prices
+        belief = self.belief[rows, agent_ids]
+        if type_bid == "FOR":
+            buy_price, n_will_buy = quote(belief, self.risk_factor[rows, agent_ids], self.wealth[rows, agent_ids],
+                                          self.n_contracts_against[rows, agent_ids], best_for, best_against, market_price)
+        else:
+            buy_price, n_will_buy = quote(1-belief, self.risk_factor[rows, agent_ids], self.wealth[rows, agent_ids],
+                                          self.n_contracts_for[rows, agent_ids], best_against, best_for, 1-market_price)
+        placed = np.flatnonzero(n_will_buy)
+        for r in placed:
+            agent = self.markets[r].all_agents[agent_ids[r]]
+            if type_bid == "FOR":
+                agent.place_bid_for(self.books[r], buy_price.item(r), n_will_buy.item(r))
+            else:
+                agent.place_bid_against(self.books[r], buy_price.item(r), n_will_buy.item(r))
+
+        # A new Bid only becomes the top of its side at a higher price level,
+        # at the same level the older Bids keep their priority.
+        best = self.best_for if type_bid == "FOR" else self.best_against
+        old_tick = np.round(best[placed] / TICK_SIZE)
+        new_tick = np.round(buy_price[placed] / TICK_SIZE)
+        new_top = np.isnan(old_tick) | (new_tick > old_tick)
+        best[placed[new_top]] = buy_price[placed[new_top]]
+        return n_will_buy > 0
+
+    def step(self):
+        """Performs a single cycle of the market in every replication."""
+        # Allow for extra time after evidence to just trade.
+        if self.iteration < self.evidence_time:
+            if self.iteration % self.iters_per_evidence == 0:
+                # All agents learn from recent changes in market price.
+                self.learn_from_market()
+                self.old_market_price = self.market_price()
+
+                self.update_universe()
+
+        order = self.rng.permuted(np.broadcast_to(np.arange(self.belief.shape[1]), self.belief.shape), axis=1)
+        for agent_ids in order.T:
+
+            # Place bids for or against the event outcome.
+            placed_for = self.place_bids(agent_ids, "FOR")
+            placed_against = self.place_bids(agent_ids, "AGAINST")
+
+            # Trade contracts if possible. Only a new Bid can cross a book
+            # left uncrossed by the previous call to transact.
+            changed = np.flatnonzero(placed_for | placed_against)
+            for r in changed:
+                transact(self.books[r], self.markets[r])
+            self.refresh(changed)
+
+        self.price_history[:, self.iteration] = self.market_price()
+        self.god_history[:, self.iteration] = self.god_belief
+        self.iteration += 1
+
+    def run(self):
+        """Performs all the remaining cycles of the market.
+
+        Returns:
+            The R x max_iter price_history and god_history arrays.
+        """
+        while self.iteration < self.max_iter:
+            self.step()
+        return self.price_history, self.god_history
@@ -0,0 +1,110 @@
+# ============================================================
+# Prediction Market Simulation - Escrow
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# The escrow reserves the funds backing every Bid resting in
+# the order book, so that any set of them can be filled. A Bid
+# never pays more than its own price, and every contract bought
+# while the agent holds a contract of the opposite type is
+# paired and pays back 1 unit of currency. The funds reserved
+# by an agent for one side of the book are then
+#
+#     max(0, sum(price * quantity) - min(quantity, n_opposite))
+#
+# summed over its resting Bids of that side. A Bid is only
+# placed for the quantity the unreserved wealth covers.
+#
+# =============================================================
+
+import math
+import numpy as np
+from agent import TICK_SIZE
+from orderbook import N_LEVELS, price_to_tick
+
+
+class Escrow:
+    """ Class representing the funds reserved by the Bids resting in
+    an order book.
+
+    Attributes:
+        market: The Market holding the wealth and contracts of the agents.
+        reserved_quantity: Dictionary {'FOR', 'AGAINST'} -> array of the
+            number of contracts every agent bids for.
+        reserved_ticks: Dictionary {'FOR', 'AGAINST'} -> array of the sum
+            of price * quantity over the Bids of every agent, in ticks.
+    """
+
+    def __init__(self, market):
+        n_agents = len(market.all_agents)
+        self.market = market
+        self.reserved_quantity = {"FOR": np.zeros(n_agents, dtype=np.int64),
+                                  "AGAINST": np.zeros(n_agents, dtype=np.int64)}
+        self.reserved_ticks = {"FOR": np.zeros(n_agents, dtype=np.int64),
+                               "AGAINST": np.zeros(n_agents, dtype=np.int64)}
+
+    def holdings(self, agent_id, type_bid):
+        """Returns the wealth of an agent, the number of contracts of
+        type type_bid and of the opposite type it holds."""
+        agent = self.market.all_agents[agent_id]
+        if type_bid == "FOR":
+            return agent.wealth, agent.n_contracts_for, agent.n_contracts_against
+        return agent.wealth, agent.n_contracts_against, agent.n_contracts_for
+
+    def reserved_wealth(self, agent_id, type_bid, n_opposite):
+        """Returns the wealth an agent reserves for its Bids of type type_bid."""
+        quantity = self.reserved_quantity[type_bid].item(agent_id)
+        ticks = self.reserved_ticks[type_bid].item(agent_id)
+        return max(0.0, ticks*TICK_SIZE - min(quantity, n_opposite))
+
+    def available_wealth(self, agent_id):
+        """Returns the wealth of an agent not reserved by its Bids."""
+        wealth, n_for, n_against = self.holdings(agent_id, "FOR")
+        return wealth - self.reserved_wealth(agent_id, "FOR", n_against) - self.reserved_wealth(agent_id, "AGAINST", n_for)
+
+    def max_quantity(self, agent_id, type_bid, tick):
+        """Returns how many more contracts of type type_bid an agent can bid
+        for at the price level tick without overdrawing its wealth."""
+        wealth, n_own, n_opposite = self.holdings(agent_id, type_bid)
+        other_type = "AGAINST" if type_bid == "FOR" else "FOR"
+        budget = wealth - self.reserved_wealth(agent_id, other_type, n_own)
+        quantity = self.reserved_quantity[type_bid].item(agent_id)
+        ticks = self.reserved_ticks[type_bid].item(agent_id)
+        n_paired = max(0, n_opposite - quantity)                                                # Contracts paired with the ones held never cost more than they pay back.
+        if tick == 0:
+            return math.inf
+        n_unpaired = math.floor(((budget + n_opposite)/TICK_SIZE - ticks)/tick + 1e-9)
+        return max(n_paired, n_unpaired)
+
+    def reserve(self, bid):
+        """Reserves the funds backing a Bid, reducing its quantity to
+        what the agent can afford.
+
+        Returns:
+            True if the Bid is backed by funds, False if the agent can't
+                afford a single contract.
+            """
+        tick = min(max(price_to_tick(bid.price), 0), N_LEVELS - 1)
+        bid.quantity = min(bid.quantity, self.max_quantity(bid.agent_id, bid.type_bid, tick))
+        if bid.quantity <= 0:
+            bid.quantity = 0
+            return False
+        self.reserved_quantity[bid.type_bid][bid.agent_id] += bid.quantity
+        self.reserved_ticks[bid.type_bid][bid.agent_id] += tick*bid.quantity
+        bid.reserved = bid.quantity
+        return True
+
+    def release(self, bid, remaining=0):
+        """Releases the funds backing the contracts of a Bid filled,
+        cancelled or removed, keeping remaining contracts reserved."""
+        released = bid.reserved - remaining
+        if released <= 0:
+            return
+        tick = min(max(price_to_tick(bid.price), 0), N_LEVELS - 1)
+        self.reserved_quantity[bid.type_bid][bid.agent_id] -= released
+        self.reserved_ticks[bid.type_bid][bid.agent_id] -= tick*released
+        bid.reserved = remaining
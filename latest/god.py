@@ -15,12 +15,20 @@ Attributes:
     p_B: Probability of event B, fixed = 0.5
     p_Agiven_notE: Probability of the event A to happen given the event (not E) = 2*self.p_A - self.p_AgivenE
     p_Bgiven_notE: Probability of the event B to happen given the event (not E) = 2*self.p_B - self.p_BgivenE  
+    rng: numpy.random.Generator drawing the evidence.
+    recipients_rng: numpy.random.Generator drawing the agents receiving the evidence.
+    log_likelihood_ratio: Dictionary {'A', 'B'} -> log(P(evidence|E) / P(evidence|not E)).
+    log_odds: log(belief / (1-belief)) if the belief is stored as log-odds, 
+        None otherwise. Updating it with a piece of evidence is the addition 
+        of the log-likelihood ratio.
 """
 
-import random
+import math
+import numpy as np
+from population import to_probability
 
 class God:
-    def __init__(self, p_AgivenE, p_BgivenE, n_agents):
+    def __init__(self, p_AgivenE, p_BgivenE, n_agents, rng=None, log_odds=False, recipients_rng=None):
         """Initialize 'True Probability' and all probabilities
         required to Bayes update."""
         self.belief = 0.5
@@ -31,13 +39,19 @@ class God:
         self.p_B = 0.5
         self.p_Agiven_notE = 2*self.p_A - self.p_AgivenE        
         self.p_Bgiven_notE = 2*self.p_B - self.p_BgivenE      
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.recipients_rng = recipients_rng if recipients_rng is not None else self.rng
+        self.log_likelihood_ratio = {"A": math.log(self.p_AgivenE / self.p_Agiven_notE),
+                                     "B": math.log(self.p_BgivenE / self.p_Bgiven_notE)}
+        self.log_odds = 0.0 if log_odds else None
     
     def get_answer_to_life_the_universe_and_everything(self):
         """Easter Egg."""
         return 42
         
     def update_belief(self, old_belief, evidence):
-        """Updates a belief using bayes rule, given a new piece of evidence."""
+        """Updates a belief using bayes rule, given a new piece of evidence.
+        old_belief can be a single belief or an array of beliefs."""
         if evidence == "A":
             new_belief = (old_belief * self.p_AgivenE) / ((old_belief * self.p_AgivenE) + ((1-old_belief) * self.p_Agiven_notE))
         else:
@@ -46,21 +60,25 @@ class God:
         
     def update_universe(self, market, n_receiving_evidence):
         """Update the 'True Probability' and update a selected number of agents' beliefs"""
-        x = random.uniform(0,1)
+        x = self.rng.uniform(0,1)
         if x < self.p_A:
             evidence = "A"
         else:
             evidence = "B"
-        self.belief = self.update_belief(self.belief, evidence)
+        if self.log_odds is None:
+            self.belief = self.update_belief(self.belief, evidence)
+        else:
+            self.log_odds += self.log_likelihood_ratio[evidence]
+            self.belief = to_probability(self.log_odds)
+        
+        #select a random set of agents to receive evidence, without replacement
+        chosen_ones = self.recipients_rng.choice(self.n_agents, size=min(n_receiving_evidence, self.n_agents), replace=False)
         
-        #select a random set of agents to receive evidence
-        all_agent_indices = [i for i in range(0, self.n_agents)]
-        random.shuffle(all_agent_indices)
-        chosen_ones = all_agent_indices[:n_receiving_evidence]
+        if market.population is not None:
+            market.population.update_belief_given_evidence(chosen_ones, self, evidence)
+            return
         
-        for i in range(0, len(chosen_ones)):
-            agent_id = chosen_ones[i]
+        for agent_id in chosen_ones:
             old_belief = market.all_agents[agent_id].belief
             new_belief = self.update_belief(old_belief, evidence)
             market.all_agents[agent_id].belief = new_belief
-        
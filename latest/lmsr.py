@@ -0,0 +1,130 @@
+# ============================================================
+# Prediction Market Simulation - LMSR Market Maker
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# Alternative market mechanism to the continuous double
+# auction: the agents trade against an automated market maker
+# using the logarithmic market scoring rule (LMSR). There is no
+# order book, every trade is priced in O(1) by the cost function
+#
+#     C(q_for, q_against) = b * log(exp(q_for/b) + exp(q_against/b))
+#
+# where b is the liquidity parameter.
+#
+# =============================================================
+
+import math
+from agent import TICK_SIZE
+
+
+class LMSRMarketMaker:
+    """ Class representing a market maker using the logarithmic
+    market scoring rule.
+
+    Attributes:
+        liquidity: The liquidity parameter b, the larger the less the
+            price moves with every contract bought.
+        q_for: Number of FOR contracts sold by the market maker.
+        q_against: Number of AGAINST contracts sold by the market maker.
+    """
+
+    def __init__(self, liquidity):
+        if liquidity <= 0:
+            raise ValueError("Invalid liquidity: must be more than 0.0.")
+        self.liquidity = liquidity
+        self.q_for = 0.0
+        self.q_against = 0.0
+
+    def cost(self, q_for, q_against):
+        """Returns the value of the cost function C(q_for, q_against)."""
+        b = self.liquidity
+        high = max(q_for, q_against)
+        return high + b*math.log(math.exp((q_for-high)/b) + math.exp((q_against-high)/b))
+
+    def price(self):
+        """Returns the price of a FOR contract, the price of an AGAINST
+        contract being 1 - price."""
+        return 1 / (1 + math.exp((self.q_against-self.q_for)/self.liquidity))
+
+    def quantities(self, type_purchase):
+        """Returns the number of contracts sold of type type_purchase and of the opposite type."""
+        if type_purchase == "FOR":
+            return self.q_for, self.q_against
+        return self.q_against, self.q_for
+
+    def quantity_to_price(self, target_price, type_purchase):
+        """Returns the number of contracts of type type_purchase to buy
+        to bring their price to target_price, clipped to
+        [TICK_SIZE, 1 - TICK_SIZE] as the price never reaches 0 or 1."""
+        target_price = min(max(target_price, TICK_SIZE), 1 - TICK_SIZE)
+        own, other = self.quantities(type_purchase)
+        return self.liquidity*math.log(target_price/(1-target_price)) - (own-other)
+
+    def quantity_for_budget(self, budget, type_purchase):
+        """Returns the number of contracts of type type_purchase whose
+        cost is exactly budget, solving C(own + n, other) = C + budget."""
+        own, other = self.quantities(type_purchase)
+        b = self.liquidity
+        total = (self.cost(self.q_for, self.q_against) + budget)/b
+        return b*(total + math.log1p(-math.exp(other/b - total))) - own
+
+    def buy(self, quantity, type_purchase):
+        """Sells quantity contracts of type type_purchase.
+
+        Returns:
+            The total cost of the contracts.
+        """
+        old_cost = self.cost(self.q_for, self.q_against)
+        if type_purchase == "FOR":
+            self.q_for += quantity
+        else:
+            self.q_against += quantity
+        return self.cost(self.q_for, self.q_against) - old_cost
+
+    def trade(self, market, agent_id):
+        """ Lets an agent buy the contracts it believes underpriced,
+            sizing the purchase like Agent.for_main and Agent.against_main.
+            The agent never pushes the price past its own belief.
+
+            Args:
+                market: The Market object the agent belongs to.
+                agent_id: Agent.ID value for the trading agent.
+
+            Returns:
+                The number of contracts bought.
+
+            >>> from market import Market
+            >>> market = Market(1, 0.3, 0.3, 100)
+            >>> market.all_agents[0].belief = 1.0
+            >>> LMSRMarketMaker(20).trade(market, 0) > 0
+            True
+            """
+        agent = market.all_agents[agent_id]
+        price = self.price()
+        if agent.belief > price:
+            type_purchase, belief, n_opposite = "FOR", agent.belief, agent.n_contracts_against
+        elif 1-agent.belief > 1-price:
+            type_purchase, belief, n_opposite = "AGAINST", 1-agent.belief, agent.n_contracts_for
+            price = 1-price
+        else:
+            return 0
+
+        n_would_like_to_buy = int((belief-price)*100*agent.risk_factor)                         # Determine number of contract to buy with risk_factor
+        n_fair = int(self.quantity_to_price(belief, type_purchase))
+        n_can_buy = int(self.quantity_for_budget(agent.wealth + n_opposite, type_purchase))     # Every contract held of the opposite type pays 1 once paired.
+        n_will_buy = min(n_would_like_to_buy, n_fair, n_can_buy)
+        if n_will_buy <= 0:
+            return 0
+
+        average_price = self.buy(n_will_buy, type_purchase) / n_will_buy
+        if type_purchase == "FOR":
+            market.buy_for(agent_id, average_price, n_will_buy)
+        else:
+            market.buy_against(agent_id, 1-average_price, n_will_buy)
+        market.market_price = self.price()
+        return n_will_buy
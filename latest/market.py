@@ -16,7 +16,8 @@
 # =============================================================
 
 from agent import Agent
-from numpy import random
+from population import AgentPopulation, LogOddsPopulation
+import numpy as np
 
 class Market:
     """ Class representing the prediction market.
@@ -24,16 +25,20 @@ class Market:
     for the contracts.
 
     Attributes:
-        all_agents: List of all the agents in the market.
+        all_agents: List of all the agents in the market, or the 
+            AgentPopulation storing them.
+        population: The AgentPopulation storing the agents as arrays,
+            None if the agents are stored as Agent objects.
         market_price: The determined value of the contracts.
         old_market_price: The value of the contracts for the 
             previous cycle.
     """
     all_agents = []
+    population = None
     market_price = None
     old_market_price = None
     
-    def __init__(self, n_agents, risk_factor, trust, wealth, belief_random=False):
+    def __init__(self, n_agents, risk_factor, trust, wealth, belief_random=False, population=False, log_odds=False, rng=None):
         """ Initialize market.
         
         Args:
@@ -45,14 +50,39 @@ class Market:
                 Regularization factor for bayesian updating.
             wealth: Units of currency owned by a single agent. Every contract
                 costs [0.0 < price < 1.0] and price_for = (1.0 - price_against).
+            belief_random: If True the starting beliefs are drawn uniformly
+                in [0.05, 0.95], otherwise every agent starts at 0.5.
+            population: If True the agents are stored in an AgentPopulation
+                of NumPy arrays instead of a list of Agent objects.
+            log_odds: If True the agents are stored in a LogOddsPopulation,
+                keeping their beliefs as log-odds. Implies population.
+            rng: numpy.random.Generator drawing the random beliefs.
         """
         if (belief_random):
-            believes = random.uniform(low=0.05, high=0.95, size=n_agents)
-            self.all_agents = [Agent(i, believes[i], risk_factor, trust, wealth) for i in range(0,n_agents)]
+            rng = rng if rng is not None else np.random.default_rng()
+            believes = rng.uniform(low=0.05, high=0.95, size=n_agents)
+        else:
+            believes = [0.5] * n_agents
+        if (log_odds):
+            self.population = LogOddsPopulation(believes, risk_factor, trust, wealth)
+            self.all_agents = self.population
+        elif (population):
+            self.population = AgentPopulation(believes, risk_factor, trust, wealth)
+            self.all_agents = self.population
         else:
-            self.all_agents = [Agent(i, 0.5, risk_factor, trust, wealth) for i in range(0,n_agents)]
+            self.all_agents = [Agent(i, believes[i], risk_factor, trust, wealth) for i in range(0,n_agents)]
         self.market_price = 0.5
         
+    @classmethod
+    def from_population(cls, population):
+        """ Returns a market of the agents stored in an existing 
+            AgentPopulation, starting at price 0.5."""
+        market = cls.__new__(cls)
+        market.population = population
+        market.all_agents = population
+        market.market_price = 0.5
+        return market
+
     def is_broke(self, agent_id, price, type_purchase):
         """ Checks if an agent can afford to pay for a contract.
         
@@ -66,6 +96,8 @@ class Market:
             A boolean value, True if the agant can afford the contract,
                 False otherwise.
             """
+        if self.population is not None:
+            return self.population.max_affordable(agent_id, price, type_purchase) < 1
         if self.all_agents[agent_id].wealth < price:
             if type_purchase == "FOR" and self.all_agents[agent_id].n_contracts_against >= 1:               # If they have a contract against to sell, they aren't broke.
                 return False
@@ -74,23 +106,54 @@ class Market:
             return True
         return False
         
-    def resolve_contracts(self, agent_id):
+    def max_affordable(self, agent_id, price, type_purchase):
+        """ Returns how many contracts an agent can afford to pay for.
+        
+        Every contract of the opposite type held by the agent is
+        exchanged for 1 unit of currency when the purchase resolves, 
+        so those contracts are always affordable.
+
+        Args:
+            agent_id: Agent.ID value for the agent to check.
+            price: The price of a single contract.
+            type_purchase: String in {'FOR', 'AGAINST'} to indicate the
+                type of contract to be bought.
+            """
+        if self.population is not None:
+            return self.population.max_affordable(agent_id, price, type_purchase)
+        agent = self.all_agents[agent_id]
+        if type_purchase == "FOR":
+            n_opposite = agent.n_contracts_against
+        else:
+            n_opposite = agent.n_contracts_for
+        return n_opposite + int((agent.wealth + n_opposite*(1-price))/price)
+
+    def resolve_contracts(self, agent_id, quantity=1):
         """ Check if an agent holds a contract FOR and AGAINST, 
             it is exchanged for 1 unit of currency."""
-        self.all_agents[agent_id].n_contracts_against -= 1
-        self.all_agents[agent_id].n_contracts_for -= 1
-        self.all_agents[agent_id].wealth += 1
+        if self.population is not None:
+            self.population.resolve_contracts(agent_id, quantity)
+            return
+        self.all_agents[agent_id].n_contracts_against -= quantity
+        self.all_agents[agent_id].n_contracts_for -= quantity
+        self.all_agents[agent_id].wealth += quantity
         
-    def buy_for(self, agent_id, price):
-        """ Resolve the transaction for a FOR contract."""
-        self.all_agents[agent_id].wealth -= price
-        self.all_agents[agent_id].n_contracts_for += 1
+    def buy_for(self, agent_id, price, quantity=1):
+        """ Resolve the transaction for quantity FOR contracts."""
+        if self.population is not None:
+            self.population.buy(agent_id, price, quantity, "FOR")
+            return
+        self.all_agents[agent_id].wealth -= price*quantity
+        self.all_agents[agent_id].n_contracts_for += quantity
         if self.all_agents[agent_id].n_contracts_against > 0:
-            self.resolve_contracts(agent_id)
+            self.resolve_contracts(agent_id, min(self.all_agents[agent_id].n_contracts_for, self.all_agents[agent_id].n_contracts_against))
     
-    def buy_against(self, agent_id, price):
-        """ Resolve the transaction for an AGAINST contract."""
-        self.all_agents[agent_id].wealth -= (1-price)
-        self.all_agents[agent_id].n_contracts_against += 1
+    def buy_against(self, agent_id, price, quantity=1):
+        """ Resolve the transaction for quantity AGAINST contracts."""
+        if self.population is not None:
+            self.population.buy(agent_id, 1-price, quantity, "AGAINST")
+            return
+        self.all_agents[agent_id].wealth -= (1-price)*quantity
+        self.all_agents[agent_id].n_contracts_against += quantity
         if self.all_agents[agent_id].n_contracts_for > 0:
-            self.resolve_contracts(agent_id)    
\ No newline at end of file
+            self.resolve_contracts(agent_id, min(self.all_agents[agent_id].n_contracts_for, self.all_agents[agent_id].n_contracts_against))
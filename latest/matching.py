@@ -0,0 +1,113 @@
+# ============================================================
+# Prediction Market Simulation - Matching Engine
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# The matching engine crosses the Bids resting in the order
+# book and resolves the resulting trades in the market.
+#
+# =============================================================
+
+from collections import namedtuple
+
+FillReport = namedtuple("FillReport", ["count", "volume", "last_price"])
+FillReport.__doc__ = """ Summary of the trades performed by a call to transact.
+
+    Attributes:
+        count: Number of trades between two Bids.
+        volume: Number of contracts exchanged in the trades.
+        last_price: Market price of the most recent trade, None if
+            no trade took place.
+    """
+
+
+def get_older_price(bid_for, bid_against):
+    """Returns the price of the most recent transaction."""
+    if bid_for.age < bid_for.age:
+        return bid_for.price
+    else:
+        return 1 - bid_against.price
+
+
+def remove_broke(book, market, type_bid):
+    """Removes the Bids at the top of one side of the book until
+    the agent of the highest Bid can afford at least one contract.
+
+    Returns:
+        The number of contracts of type type_bid the agent placing
+            the highest Bid can buy, 0 if that side of the book is empty.
+        """
+    while not book.is_empty(type_bid):
+        bid = book.peek(type_bid)
+        n_affordable = min(bid.quantity, market.max_affordable(bid.agent_id, bid.price, type_bid))
+        if n_affordable > 0:
+            return n_affordable
+        book.pop(type_bid)
+    return 0
+
+
+def top_quantity(book, market, type_bid):
+    """Returns the number of contracts of type type_bid the highest Bid
+    can buy, 0 if that side of the book is empty. Only Bids backed by
+    an escrow are traded without checking that their agent can pay."""
+    if book.escrow is None:
+        return remove_broke(book, market, type_bid)
+    bid = book.peek(type_bid)
+    return 0 if bid is None else bid.quantity
+
+
+def transact(book, market):
+    """Performs transactions.
+
+    Resolves all the crossing bids for contracts stacked by the agents.
+    Two crossing bids trade as many contracts as both can afford, the
+    remainder of the larger bid keeps resting in the book. Bids of agents
+    who can't pay are removed from the book, unless the book holds their
+    funds in escrow.
+
+    Args:
+        book: OrderBook holding the bids for contracts paying for
+            positive and negative outcome.
+        market: The Market object to perform the transactions in.
+
+    Returns:
+        A FillReport summarizing the trades.
+    """
+    count = 0
+    volume = 0
+    last_price = None
+    while True:
+        n_for = top_quantity(book, market, "FOR")
+        if n_for == 0:
+            break
+        n_against = top_quantity(book, market, "AGAINST")
+        if n_against == 0:
+            break
+
+        highest_bid_for = book.best_for()
+        highest_bid_against = book.best_against()
+        if highest_bid_for.price + highest_bid_against.price < 1:
+            break
+
+        quantity = min(n_for, n_against)
+        bid_for = book.fill("FOR", quantity)
+        bid_against = book.fill("AGAINST", quantity)
+
+        # Market price becomes the price of the most recent transaction.
+        last_price = get_older_price(bid_for, bid_against)
+
+        # Resolve transactions.
+        market.buy_for(bid_for.agent_id, last_price, quantity)
+        market.buy_against(bid_against.agent_id, last_price, quantity)
+
+        count += 1
+        volume += quantity
+
+    # Sets the new market price
+    if last_price is not None:
+        market.market_price = last_price
+    return FillReport(count, volume, last_price)
@@ -0,0 +1,319 @@
+# ============================================================
+# Prediction Market Simulation - Order Book
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# The order book keeps the resting Bids of both sides. Prices
+# only live on the TICK_SIZE grid, so every side is stored as
+# a fixed array of resting quantity indexed by price level,
+# plus a FIFO queue per level giving time priority.
+#
+# Bids can be given a time-to-live in market cycles: the book
+# records the clock value at the start of every cycle and, as
+# every queue is in chronological order, expired Bids are
+# evicted in bulk from the front of the queues. The number of
+# Bids every agent keeps resting can be capped as well: a new Bid
+# evicts the oldest Bids of its agent beyond the cap.
+#
+# The book indexes the resting Bids of every agent, so an agent
+# can cancel or reprice them. Cancelled Bids are deleted lazily:
+# their quantity drops to 0 at once, and they are discarded
+# when they reach the front of their queue.
+#
+# With an Escrow every Bid reserves its funds when it is placed
+# and releases them when it leaves the book, so the Bids resting
+# in the book can always be paid for.
+#
+# =============================================================
+
+from collections import defaultdict, deque
+import itertools
+import numpy as np
+from agent import TICK_SIZE
+from bid import Bid
+
+N_LEVELS = int(round(1 / TICK_SIZE)) + 1                 # Price levels [0.0, TICK_SIZE, ..., 1.0]
+
+
+def price_to_tick(price):
+    """Returns the index of the price level closest to price."""
+    return int(round(price / TICK_SIZE))
+
+
+class OrderBook:
+    """ Class representing the book of Bids resting in the market.
+
+    Attributes:
+        quantity: Dictionary {'FOR', 'AGAINST'} -> array of N_LEVELS
+            integers, the number of contracts resting at every price level
+            summed over the quantity of its Bids.
+        queues: Dictionary {'FOR', 'AGAINST'} -> list of N_LEVELS deques,
+            the Bids resting at every price level in chronological order.
+        cached_best: Dictionary {'FOR', 'AGAINST'} -> highest price level
+            holding Bids, None if the side is empty. Only valid while the
+            side is not in stale_best.
+        stale_best: Set of the sides whose cached_best has been invalidated
+            by removing Bids from the book.
+        clock: Iterator yielding the TIME values that order the Bids
+            placed in the book chronologically.
+        order_ttl: Number of market cycles a Bid rests in the book
+            before expiring, None if Bids never expire.
+        max_orders_per_agent: Maximum number of Bids an agent can keep
+            resting in the book, None for no limit. Placing one more Bid
+            cancels the oldest Bid of the agent.
+        cycle_starts: The TIME values at the start of the last
+            order_ttl market cycles, the current one included.
+        orders: Dictionary agent_id -> dictionary Bid.age -> Bid, the
+            Bids of every agent resting in the book.
+        escrow: The Escrow reserving the funds of the resting Bids, None
+            if the Bids are not backed by reserved funds.
+    """
+
+    def __init__(self, clock=None, order_ttl=None, max_orders_per_agent=None, escrow=None):
+        if order_ttl is not None and order_ttl < 1:
+            raise ValueError("Invalid order time-to-live: must be at least 1 cycle.")
+        if max_orders_per_agent is not None and max_orders_per_agent < 1:
+            raise ValueError("Invalid maximum number of orders per agent: must be at least 1.")
+        self.quantity = {"FOR": np.zeros(N_LEVELS, dtype=np.int64),
+                         "AGAINST": np.zeros(N_LEVELS, dtype=np.int64)}
+        self.queues = {"FOR": [deque() for _ in range(N_LEVELS)],
+                       "AGAINST": [deque() for _ in range(N_LEVELS)]}
+        self.cached_best = {"FOR": None, "AGAINST": None}
+        self.stale_best = set()
+        self.clock = clock if clock is not None else itertools.count()
+        self.order_ttl = order_ttl
+        self.max_orders_per_agent = max_orders_per_agent
+        self.cycle_starts = deque(maxlen=order_ttl)
+        self.orders = defaultdict(dict)
+        self.escrow = escrow
+
+    def __len__(self):
+        return int(self.quantity["FOR"].sum() + self.quantity["AGAINST"].sum())
+
+    def is_empty(self, type_bid):
+        """Returns True if no Bid of type type_bid is resting in the book."""
+        return self.best_tick(type_bid) is None
+
+    def best_tick(self, type_bid):
+        """Returns the highest price level holding Bids of type type_bid,
+        or None if that side of the book is empty."""
+        if type_bid in self.stale_best:
+            old_best = self.cached_best[type_bid]
+            levels = np.flatnonzero(self.quantity[type_bid][:old_best + 1])             # Removing Bids never raises the best price.
+            self.cached_best[type_bid] = int(levels[-1]) if levels.size else None
+            self.stale_best.discard(type_bid)
+        return self.cached_best[type_bid]
+
+    def best_for(self):
+        """Returns the oldest Bid at the highest price for the positive
+        outcome, or None if no such Bid is resting in the book."""
+        return self.peek("FOR")
+
+    def best_against(self):
+        """Returns the oldest Bid at the highest price for the negative
+        outcome, or None if no such Bid is resting in the book."""
+        return self.peek("AGAINST")
+
+    def set_level(self, type_bid, tick, bids):
+        """Replaces the Bids resting at a price level with bids, in
+        chronological order. Can only remove Bids or reduce their quantity."""
+        bids = [bid for bid in bids if bid.quantity > 0]
+        kept = set(map(id, bids))
+        for bid in self.queues[type_bid][tick]:
+            self.orders[bid.agent_id].pop(bid.age, None)
+            if self.escrow is not None:
+                self.escrow.release(bid, bid.quantity if id(bid) in kept else 0)
+        for bid in bids:
+            self.orders[bid.agent_id][bid.age] = bid
+        self.queues[type_bid][tick] = deque(bids)
+        self.quantity[type_bid][tick] = sum(bid.quantity for bid in bids)
+        if not bids:
+            self.stale_best.add(type_bid)
+
+    def level_emptied(self, type_bid, tick):
+        """Discards the cancelled Bids left at a price level with no
+        contracts resting, and invalidates the best price level."""
+        self.queues[type_bid][tick].clear()
+        self.stale_best.add(type_bid)
+
+    def front(self, type_bid, tick):
+        """Returns the queue of a price level holding contracts, after
+        discarding the cancelled Bids at its front."""
+        queue = self.queues[type_bid][tick]
+        while queue[0].quantity == 0:
+            queue.popleft()
+        return queue
+
+    def push(self, bid):
+        """Stacks a Bid at the back of the queue of its price level.
+
+        If the agent already has max_orders_per_agent Bids resting in
+        the book, its oldest Bids are cancelled to make room.
+
+        Returns:
+            True if the Bid was placed, False if, with an escrow, its
+                agent can't afford a single contract. The escrow can
+                reduce the quantity of the Bid.
+            """
+        agent_orders = self.orders[bid.agent_id]
+        if self.max_orders_per_agent is not None:
+            while len(agent_orders) >= self.max_orders_per_agent:
+                self.cancel(agent_orders[min(agent_orders)])                                    # Ages are the keys, the smallest is the oldest Bid.
+        if self.escrow is not None and not self.escrow.reserve(bid):
+            return False
+        agent_orders[bid.age] = bid
+        tick = min(max(price_to_tick(bid.price), 0), N_LEVELS - 1)
+        self.queues[bid.type_bid][tick].append(bid)
+        self.quantity[bid.type_bid][tick] += bid.quantity
+        best = self.best_tick(bid.type_bid)
+        if best is None or tick > best:
+            self.cached_best[bid.type_bid] = tick
+        return True
+
+    def peek(self, type_bid):
+        """Returns the oldest Bid at the highest price of type type_bid,
+        or None if that side of the book is empty."""
+        tick = self.best_tick(type_bid)
+        if tick is None:
+            return None
+        return self.front(type_bid, tick)[0]
+
+    def pop(self, type_bid):
+        """Removes and returns the Bid that peek(type_bid) would return."""
+        tick = self.best_tick(type_bid)
+        if tick is None:
+            raise IndexError("pop from an empty side of the book")
+        bid = self.front(type_bid, tick).popleft()
+        self.quantity[type_bid][tick] -= bid.quantity
+        del self.orders[bid.agent_id][bid.age]
+        if self.escrow is not None:
+            self.escrow.release(bid)
+        if self.quantity[type_bid][tick] == 0:
+            self.level_emptied(type_bid, tick)
+        return bid
+
+    def fill(self, type_bid, quantity):
+        """Buys quantity contracts of the Bid that peek(type_bid) would
+        return, removing it from the book once it is completely filled.
+
+        Returns:
+            The filled Bid.
+            """
+        tick = self.best_tick(type_bid)
+        if tick is None:
+            raise IndexError("fill from an empty side of the book")
+        queue = self.front(type_bid, tick)
+        bid = queue[0]
+        if quantity > bid.quantity:
+            raise ValueError("cannot fill more contracts than the bid holds")
+        bid.quantity -= quantity
+        self.quantity[type_bid][tick] -= quantity
+        if self.escrow is not None:
+            self.escrow.release(bid, bid.quantity)
+        if bid.quantity == 0:
+            queue.popleft()
+            del self.orders[bid.agent_id][bid.age]
+            if self.quantity[type_bid][tick] == 0:
+                self.level_emptied(type_bid, tick)
+        return bid
+
+    def cancel(self, bid):
+        """Withdraws a Bid resting in the book.
+
+        Returns:
+            True if the Bid was cancelled, False if it was no longer
+                resting in the book.
+            """
+        if self.orders[bid.agent_id].pop(bid.age, None) is None:
+            return False
+        tick = min(max(price_to_tick(bid.price), 0), N_LEVELS - 1)
+        self.quantity[bid.type_bid][tick] -= bid.quantity
+        bid.quantity = 0                                                                        # Deleted lazily, see OrderBook.front.
+        if self.escrow is not None:
+            self.escrow.release(bid)
+        if self.quantity[bid.type_bid][tick] == 0:
+            self.level_emptied(bid.type_bid, tick)
+        return True
+
+    def cancel_all(self, agent_id):
+        """Withdraws all the Bids of an agent resting in the book.
+
+        Returns:
+            The number of Bids cancelled.
+            """
+        bids = list(self.orders[agent_id].values())
+        for bid in bids:
+            self.cancel(bid)
+        return len(bids)
+
+    def replace(self, bid, price, quantity):
+        """Cancels a Bid resting in the book and places a new Bid of the
+        same agent and type at price, losing its time priority. If bid
+        was resting it is cancelled, whether the new Bid is placed or not.
+
+        Returns:
+            The new Bid, or None if bid was no longer resting in the book
+                or the new Bid was refused, see push.
+            """
+        if not self.cancel(bid):
+            return None
+        new_bid = Bid(bid.type_bid, price, next(self.clock), bid.agent_id, quantity)
+        if not self.push(new_bid):
+            return None
+        return new_bid
+
+    def resting_orders(self, agent_id):
+        """Returns the list of the Bids of an agent resting in the book,
+        in chronological order."""
+        return list(self.orders[agent_id].values())
+
+    def start_cycle(self):
+        """Marks the start of a market cycle and evicts the Bids placed
+        order_ttl cycles ago or earlier: with order_ttl = 1 a Bid placed
+        in a cycle expires at the start of the next one.
+
+        Returns:
+            The number of Bids evicted.
+
+        >>> from bid import Bid
+        >>> book = OrderBook(order_ttl=2)
+        >>> book.start_cycle()
+        0
+        >>> book.push(Bid("FOR", 0.5, next(book.clock), 0))
+        True
+        >>> book.start_cycle(), len(book)
+        (0, 1)
+        >>> book.start_cycle(), len(book)
+        (1, 0)
+        >>> book = OrderBook(order_ttl=1)
+        >>> book.start_cycle()
+        0
+        >>> book.push(Bid("FOR", 0.5, next(book.clock), 0))
+        True
+        >>> book.start_cycle(), len(book)
+        (1, 0)
+            """
+        if self.order_ttl is None:
+            return 0
+        n_evicted = 0
+        self.cycle_starts.append(next(self.clock))
+        if len(self.cycle_starts) == self.order_ttl:
+            oldest_allowed = self.cycle_starts[0]                                               # Bids placed before the oldest cycle kept have expired.
+            for type_bid in ("FOR", "AGAINST"):
+                for tick in np.flatnonzero(self.quantity[type_bid]):
+                    queue = self.queues[type_bid][tick]
+                    while queue and queue[0].age < oldest_allowed:
+                        bid = queue.popleft()
+                        if bid.quantity > 0:                                                    # Cancelled Bids are already out of the index.
+                            self.quantity[type_bid][tick] -= bid.quantity
+                            del self.orders[bid.agent_id][bid.age]
+                            if self.escrow is not None:
+                                self.escrow.release(bid)
+                            n_evicted += 1
+                    if self.quantity[type_bid][tick] == 0:
+                        self.level_emptied(type_bid, tick)
+        return n_evicted
@@ -0,0 +1,59 @@
+# ============================================================
+# Prediction Market Simulation - Orders
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# Vectorized version of the bidding rule of Agent.for_main and
+# Agent.against_main: given arrays describing many agents and
+# the top of their books, computes the price and the number of
+# contracts of all their Bids with a few NumPy calls.
+#
+# =============================================================
+
+import numpy as np
+from agent import TICK_SIZE
+
+
+def book_top_price(bid):
+    """Returns the price of a Bid, NaN if there is no Bid."""
+    return np.nan if bid is None else bid.price
+
+
+def quote(belief, risk_factor, wealth, n_opposite, best_own, best_other, base_price):
+    """ Computes the Bids of many agents for one type of contract,
+        following the rule of Agent.for_main and Agent.against_main.
+
+        For FOR contracts pass the beliefs, the AGAINST contracts held,
+        the best FOR and AGAINST prices and the market price; for AGAINST
+        contracts pass 1 - beliefs, the FOR contracts held, the best
+        AGAINST and FOR prices and 1 - the market price.
+
+        Args:
+            belief: Array of the probability of the outcome paid by the
+                contract, according to every agent.
+            risk_factor: Array of the risk factor of every agent.
+            wealth: Array of the wealth of every agent.
+            n_opposite: Array of the contracts of the opposite type held
+                by every agent.
+            best_own: Array of the highest price bid for the contract,
+                NaN where no such Bid is resting in the book.
+            best_other: Array of the highest price bid for the opposite
+                contract, NaN where no such Bid is resting in the book.
+            base_price: Array of the price of the contract when the book
+                is empty.
+
+        Returns:
+            The arrays of the bidding prices and of the number of contracts
+                to bid for, the agents not bidding have 0 contracts.
+        """
+    buy_price = np.where(np.isnan(best_own),
+                         np.where(np.isnan(best_other), base_price + TICK_SIZE, 1 - best_other),    # Offer to buy at the cheapest price.
+                         best_own + TICK_SIZE)                                                      # Offer to buy at TICK_SIZE more than the next highest Bid.
+    n_would_like_to_buy = np.trunc((belief-buy_price)*100*risk_factor)
+    n_can_buy = np.trunc(wealth/buy_price) + n_opposite
+    n_will_buy = np.maximum(np.minimum(n_would_like_to_buy, n_can_buy), 0).astype(np.int64)
+    return buy_price, n_will_buy
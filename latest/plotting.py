@@ -0,0 +1,100 @@
+# ============================================================
+# Prediction Market Simulation - Plotting
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# The live plot shows the market price and God's belief while
+# the simulation runs. The lines are created once and their
+# data is updated in place, redrawing only the lines (blitting)
+# every few iterations, so the cost of a redraw doesn't grow
+# with the number of completed cycles.
+#
+# =============================================================
+
+import numpy as np
+
+LEGEND = ['Market Price', 'True Bayesian Probability']
+
+
+class LivePlot:
+    """ Class plotting the histories of a simulation in real-time.
+
+    matplotlib is imported when the plot is created, never by
+    the simulation itself.
+
+    Attributes:
+        redraw_interval: Number of cycles between two redraws.
+        fig: The matplotlib.figure.Figure of the plot.
+        ax: The axes of the plot.
+        price_line: Line2D of the market price.
+        god_line: Line2D of God's belief.
+        background: Saved canvas without the lines, restored before
+            every redraw. None if the canvas doesn't support blitting.
+    """
+
+    def __init__(self, max_iter, redraw_interval=1):
+        """ Creates the figure.
+
+        Args:
+            max_iter: Number of cycles of the simulation, fixes the x axis.
+            redraw_interval: Number of cycles between two redraws.
+        """
+        import matplotlib.pyplot as plt
+        self.plt = plt
+        self.redraw_interval = max(1, redraw_interval)
+        self.fig, self.ax = plt.subplots(figsize=(16,8))
+        self.ax.grid()
+        self.ax.set_xlim(0, max(max_iter - 1, 1))
+        self.ax.set_ylim(0, 1)                                                                 # Prices and probabilities live in [0, 1].
+        self.ax.set_xlabel("Iterations (Market Cycles)")
+        self.ax.set_ylabel("Price")
+        self.price_line, = self.ax.plot([], [], "blue", animated=True)
+        self.god_line, = self.ax.plot([], [], "orange", animated=True)
+        self.ax.legend(LEGEND)
+        self.background = None
+        self.fig.canvas.mpl_connect("draw_event", self.on_draw)
+        plt.show(block=False)
+        self.fig.canvas.draw()
+
+    def on_draw(self, event):
+        """Saves the background every time the whole figure is drawn,
+        e.g. after resizing the window."""
+        if self.fig.canvas.supports_blit:
+            self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        self.ax.draw_artist(self.price_line)
+        self.ax.draw_artist(self.god_line)
+
+    def update(self, price_history, god_history):
+        """Updates the lines with the histories at the end of a cycle,
+        redrawing them every redraw_interval cycles."""
+        if len(price_history) % self.redraw_interval != 0:
+            return
+        self.redraw(price_history, god_history)
+
+    def redraw(self, price_history, god_history):
+        x = np.arange(len(price_history))
+        self.price_line.set_data(x, price_history)
+        self.god_line.set_data(x, god_history)
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw_idle()
+        else:
+            canvas.restore_region(self.background)
+            self.draw_lines()
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def show(self, price_history, god_history):
+        """Draws the complete histories and blocks until the window is closed."""
+        self.price_line.set_animated(False)
+        self.god_line.set_animated(False)
+        self.background = None
+        self.redraw(price_history, god_history)
+        self.plt.show()
@@ -0,0 +1,218 @@
+# ============================================================
+# Prediction Market Simulation - Agent Population
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# The population stores the state of all the agents as a
+# struct of NumPy arrays indexed by Agent.ID, instead of one
+# Agent object per agent.
+#
+# =============================================================
+
+import math
+import numpy as np
+from agent import Agent
+
+
+def to_log_odds(belief):
+    """Returns the log-odds log(p / (1-p)) of a probability or array of probabilities."""
+    return np.log(belief) - np.log1p(-belief)
+
+
+def to_probability(log_odds):
+    """Returns the probability of a log-odds value or array of log-odds values."""
+    return 1 / (1 + np.exp(-log_odds))
+
+
+def column(name):
+    """Returns a property reading and writing the agent's entry of
+    the population array called name."""
+    def get(self):
+        return getattr(self.population, name).item(self.ID)
+
+    def set(self, value):
+        getattr(self.population, name)[self.ID] = value
+    return property(get, set)
+
+
+class PopulationAgent(Agent):
+    """ Agent whose attributes are views on an AgentPopulation.
+
+    Behaves like an Agent, but owns no state: it is created on demand
+    when indexing the population and can be discarded right after.
+
+    Attributes:
+        population: The AgentPopulation storing the agent.
+        ID: Index of the agent in the population.
+    """
+    belief = column("belief")
+    risk_factor = column("risk_factor")
+    trust = column("trust")
+    wealth = column("wealth")
+    n_contracts_for = column("n_contracts_for")
+    n_contracts_against = column("n_contracts_against")
+
+    def __init__(self, population, ID):
+        self.population = population
+        self.ID = ID
+
+
+class AgentPopulation:
+    """ Class storing all the agents of the market as arrays.
+
+    Every attribute is an array with one entry per agent, indexed
+    by Agent.ID. Indexing the population returns a PopulationAgent.
+
+    Attributes:
+        belief: Probability of the event to have a positive outcome
+            from the point of view of every agent.
+        risk_factor: Risk factor of every agent.
+        trust: Trust of every agent in the market price.
+        wealth: Units of currency owned by every agent.
+        n_contracts_for: The number of FOR contracts of every agent.
+        n_contracts_against: The number of AGAINST contracts of every agent.
+        agent_class: Class of the views returned when indexing the population.
+    """
+    agent_class = PopulationAgent
+
+    def __init__(self, beliefs, risk_factor, trust, wealth):
+        """ Initialize the population.
+
+        Args:
+            beliefs: Sequence with the starting belief of every agent.
+            risk_factor: Risk factor, shared or one value per agent.
+            trust: Trust in the market price, shared or one value per agent.
+            wealth: Starting wealth, shared or one value per agent.
+        """
+        n_agents = len(beliefs)
+        self.belief = np.array(beliefs, dtype=np.float64)
+        self.risk_factor = np.full(n_agents, risk_factor, dtype=np.float64)
+        self.trust = np.full(n_agents, trust, dtype=np.float64)
+        self.wealth = np.full(n_agents, wealth, dtype=np.float64)
+        self.n_contracts_for = np.zeros(n_agents, dtype=np.int64)
+        self.n_contracts_against = np.zeros(n_agents, dtype=np.int64)
+
+    @classmethod
+    def from_arrays(cls, belief, risk_factor, trust, wealth, n_contracts_for, n_contracts_against):
+        """Returns a population whose attributes are the given arrays,
+        without copying them, e.g. rows of the arrays of an Ensemble."""
+        population = cls.__new__(cls)
+        population.belief = belief
+        population.risk_factor = risk_factor
+        population.trust = trust
+        population.wealth = wealth
+        population.n_contracts_for = n_contracts_for
+        population.n_contracts_against = n_contracts_against
+        return population
+
+    def __len__(self):
+        return self.belief.size
+
+    def __getitem__(self, agent_id):
+        return self.agent_class(self, agent_id)
+
+    def __iter__(self):
+        return (self.agent_class(self, i) for i in range(len(self)))
+
+    def update_belief_given_market(self, bayes_factor):
+        """ Updates the belief of every agent at once, see 
+            Agent.update_belief_given_market. The trust of every
+            agent regularizes its own update.
+            
+            Args:
+                bayes_factor: Factor for scaling probabilities 
+                    with Bayesian Updating.
+            """
+        adjusted_bayes_factor = (self.trust*bayes_factor) + (1-self.trust)
+        self.belief /= self.belief + adjusted_bayes_factor*(1-self.belief)
+
+    def update_belief_given_evidence(self, agent_ids, god, evidence):
+        """ Updates the belief of the selected agents using bayes rule,
+            given a new piece of evidence.
+            
+            Args:
+                agent_ids: Array with the Agent.ID of the agents receiving
+                    the evidence.
+                god: The God holding the likelihoods of the evidence.
+                evidence: String in {'A', 'B'}, the piece of evidence.
+            """
+        self.belief[agent_ids] = god.update_belief(self.belief[agent_ids], evidence)
+
+    def max_affordable(self, agent_id, price, type_purchase):
+        """Returns how many contracts an agent can afford to pay for,
+        see Market.max_affordable."""
+        if type_purchase == "FOR":
+            n_opposite = self.n_contracts_against.item(agent_id)
+        else:
+            n_opposite = self.n_contracts_for.item(agent_id)
+        return n_opposite + int((self.wealth.item(agent_id) + n_opposite*(1-price))/price)
+
+    def resolve_contracts(self, agent_id, quantity=1):
+        """Exchanges quantity pairs of FOR and AGAINST contracts of an
+        agent for 1 unit of currency each."""
+        self.n_contracts_against[agent_id] -= quantity
+        self.n_contracts_for[agent_id] -= quantity
+        self.wealth[agent_id] += quantity
+
+    def buy(self, agent_id, cost, quantity, type_purchase):
+        """Resolves the purchase of quantity contracts of type
+        type_purchase, paying cost per contract."""
+        self.wealth[agent_id] -= cost*quantity
+        if type_purchase == "FOR":
+            self.n_contracts_for[agent_id] += quantity
+        else:
+            self.n_contracts_against[agent_id] += quantity
+        n_pairs = min(self.n_contracts_for.item(agent_id), self.n_contracts_against.item(agent_id))
+        if n_pairs > 0:
+            self.resolve_contracts(agent_id, n_pairs)
+
+
+class LogOddsAgent(PopulationAgent):
+    """ Agent view on a LogOddsPopulation, converting its log-odds
+    to a probability only when the belief is read to bid."""
+
+    @property
+    def belief(self):
+        return 1 / (1 + math.exp(-self.population.log_odds.item(self.ID)))
+
+    @belief.setter
+    def belief(self, value):
+        self.population.log_odds[self.ID] = math.log(value) - math.log1p(-value)
+
+
+class LogOddsPopulation(AgentPopulation):
+    """ AgentPopulation storing the beliefs as log-odds.
+
+    In log-odds, Bayesian updating with a piece of evidence is the
+    addition of its log-likelihood ratio, and learning from the market
+    is the subtraction of the log of the trust-adjusted bayes factor.
+    Beliefs are converted to probabilities only when bidding.
+
+    Attributes:
+        log_odds: log(belief / (1-belief)) of every agent.
+        belief: Probability of the event from the point of view of
+            every agent, computed from log_odds.
+    """
+    agent_class = LogOddsAgent
+
+    @property
+    def belief(self):
+        return to_probability(self.log_odds)
+
+    @belief.setter
+    def belief(self, value):
+        self.log_odds = to_log_odds(np.asarray(value, dtype=np.float64))
+
+    def update_belief_given_market(self, bayes_factor):
+        """Updates the log-odds of every agent, see
+        AgentPopulation.update_belief_given_market."""
+        self.log_odds -= np.log((self.trust*bayes_factor) + (1-self.trust))
+
+    def update_belief_given_evidence(self, agent_ids, god, evidence):
+        """Adds the log-likelihood ratio of a piece of evidence to the
+        log-odds of the selected agents."""
+        self.log_odds[agent_ids] += god.log_likelihood_ratio[evidence]
@@ -0,0 +1,96 @@
+# ============================================================
+# Prediction Market Simulation - Renderer
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# The renderer draws the live plot in a separate process, fed
+# with the new market prices and God's beliefs over a queue.
+# The simulation never waits on the display: when the renderer
+# falls behind, the points pile up and are sent together, and
+# the renderer only draws the latest state of the histories.
+#
+# =============================================================
+
+import multiprocessing
+import queue
+
+QUEUE_SIZE = 2                   # Number of batches of points waiting for the renderer
+
+
+def render(points, max_iter):
+    """Main loop of the renderer process.
+
+    Args:
+        points: multiprocessing.Queue of lists of (price, god_belief)
+            points, None once the simulation is over.
+        max_iter: Number of cycles of the simulation.
+    """
+    from plotting import LivePlot
+    live_plot = LivePlot(max_iter)
+    price_history = []
+    god_history = []
+    finished = False
+    while not finished:
+        try:
+            batch = points.get(timeout=0.05)
+        except queue.Empty:
+            live_plot.fig.canvas.flush_events()                                                # Keep the window responsive.
+            continue
+        while True:                                                                            # Drain the queue, drawing only the latest frame.
+            if batch is None:
+                finished = True
+                break
+            for price, god_belief in batch:
+                price_history.append(price)
+                god_history.append(god_belief)
+            try:
+                batch = points.get_nowait()
+            except queue.Empty:
+                break
+        live_plot.redraw(price_history, god_history)
+    live_plot.show(price_history, god_history)
+
+
+class RemoteRenderer:
+    """ Class sending the histories of a simulation to a renderer process.
+
+    Has the same update/show interface as plotting.LivePlot.
+
+    Attributes:
+        points: Queue feeding the renderer process.
+        pending: Points not yet sent because the queue was full.
+        n_sent: Number of points of the histories already collected.
+        process: The renderer process.
+    """
+
+    def __init__(self, max_iter):
+        self.points = multiprocessing.Queue(maxsize=QUEUE_SIZE)
+        self.pending = []
+        self.n_sent = 0
+        self.process = multiprocessing.Process(target=render, args=(self.points, max_iter))
+        self.process.start()
+
+    def update(self, price_history, god_history):
+        """Sends the new points of the histories without blocking. If the
+        renderer is behind they are kept and sent with the next ones."""
+        self.pending.extend(zip(price_history[self.n_sent:], god_history[self.n_sent:]))
+        self.n_sent = len(price_history)
+        try:
+            self.points.put_nowait(self.pending)
+        except queue.Full:
+            return
+        self.pending = []
+
+    def show(self, price_history, god_history):
+        """Sends the remaining points and waits until the plot window is closed."""
+        self.pending.extend(zip(price_history[self.n_sent:], god_history[self.n_sent:]))
+        self.n_sent = len(price_history)
+        if self.pending:
+            self.points.put(self.pending)
+            self.pending = []
+        self.points.put(None)
+        self.process.join()
@@ -0,0 +1,99 @@
+# ============================================================
+# Prediction Market Simulation - Sampling Designs
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# Space-filling designs sample a few hundred points of a box of
+# continuous parameters instead of the Cartesian product of a
+# grid, whose size explodes with every new dimension. A Latin
+# hypercube puts one point in every one of n slices of every
+# dimension; a Sobol sequence is a low-discrepancy sequence,
+# generated here from the Joe-Kuo direction numbers.
+#
+# =============================================================
+
+import numpy as np
+
+N_BITS = 32
+
+# Joe-Kuo direction numbers (new-joe-kuo-6.21201) of the dimensions
+# 2, 3, ...: degree s, coefficients a and initial numbers m of the
+# primitive polynomial. The first dimension is the van der Corput sequence.
+DIRECTION_NUMBERS = [
+    (1, 0, [1]),
+    (2, 1, [1, 3]),
+    (3, 1, [1, 3, 1]),
+    (3, 2, [1, 1, 1]),
+    (4, 1, [1, 1, 3, 3]),
+    (4, 4, [1, 3, 5, 13]),
+    (5, 2, [1, 1, 5, 5, 17]),
+    (5, 4, [1, 1, 5, 5, 5]),
+    (5, 7, [1, 1, 7, 11, 19]),
+]
+
+
+def direction_integers(dimension):
+    """Returns the N_BITS direction integers of a dimension of the Sobol
+    sequence, dimension 0 being the van der Corput sequence."""
+    v = np.zeros(N_BITS, dtype=np.uint64)
+    if dimension == 0:
+        for k in range(N_BITS):
+            v[k] = 1 << (N_BITS - 1 - k)
+        return v
+    s, a, m = DIRECTION_NUMBERS[dimension - 1]
+    for k in range(N_BITS):
+        if k < s:
+            v[k] = m[k] << (N_BITS - 1 - k)
+        else:
+            value = int(v[k - s]) ^ (int(v[k - s]) >> s)
+            for i in range(1, s):
+                if (a >> (s - 1 - i)) & 1:
+                    value ^= int(v[k - i])
+            v[k] = value
+    return v
+
+
+def sobol(n_points, n_dimensions, skip=0):
+    """ Returns the points skip, ..., skip + n_points - 1 of the Sobol
+        sequence in the unit hypercube.
+
+        The sequence is balanced for numbers of points that are powers
+        of 2; its first point is the origin.
+
+        Returns:
+            An n_points x n_dimensions array.
+        """
+    if n_dimensions > len(DIRECTION_NUMBERS) + 1:
+        raise ValueError("Invalid number of dimensions: at most {}.".format(len(DIRECTION_NUMBERS) + 1))
+    index = np.arange(skip, skip + n_points, dtype=np.uint64)
+    gray = index ^ (index >> np.uint64(1))                                                      # The point of index i is the XOR of the direction integers of the bits of its Gray code.
+    points = np.zeros((n_points, n_dimensions), dtype=np.uint64)
+    for dimension in range(n_dimensions):
+        v = direction_integers(dimension)
+        for bit in range(N_BITS):
+            points[:, dimension] ^= np.where((gray >> np.uint64(bit)) & np.uint64(1), v[bit], np.uint64(0))
+    return points / float(1 << N_BITS)
+
+
+def latin_hypercube(n_points, n_dimensions, rng=None):
+    """ Returns n_points drawn in the unit hypercube so that every one of
+        the n_points slices of equal width of every dimension holds exactly
+        one point.
+
+        Returns:
+            An n_points x n_dimensions array.
+        """
+    rng = rng if rng is not None else np.random.default_rng()
+    slices = rng.permuted(np.tile(np.arange(n_points), (n_dimensions, 1)), axis=1).T
+    return (slices + rng.random((n_points, n_dimensions))) / n_points
+
+
+def scale(points, bounds):
+    """Maps points of the unit hypercube to the box of the (low, high)
+    bounds of every dimension."""
+    bounds = np.asarray(bounds, dtype=np.float64)
+    return bounds[:, 0] + points * (bounds[:, 1] - bounds[:, 0])
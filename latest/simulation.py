@@ -0,0 +1,272 @@
+# ============================================================
+# Prediction Market Simulation - Simulation
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# A Simulation owns every piece of state of a single run: the
+# market, God, the order book, its own seeded random generator
+# and the clock ordering the bids. Many simulations can run
+# concurrently in threads or processes with independent and
+# reproducible random streams.
+#
+# With common random numbers the initial beliefs, the evidence,
+# the agents receiving it and the order of the agents are drawn
+# from four separate streams of the seed, so the runs of
+# different parameters with the same seed share their random
+# draws as far as possible.
+#
+# =============================================================
+
+import itertools
+import numpy as np
+from agent import TICK_SIZE
+from god import God
+from market import Market
+from orderbook import OrderBook
+from escrow import Escrow
+from matching import transact
+from auction import clear_call_auction
+from lmsr import LMSRMarketMaker
+from orders import book_top_price, quote
+
+
+STREAMS = ("beliefs", "evidence", "recipients", "ordering")
+
+
+def random_streams(seed, common_random_numbers=False):
+    """ Returns the dictionary name -> numpy.random.Generator of the
+        random STREAMS of a run.
+
+        Args:
+            seed: Seed of the run, anything accepted by
+                numpy.random.SeedSequence, or a SeedSequence.
+            common_random_numbers: If True every stream has its own
+                generator, spawned from seed. Otherwise one generator
+                draws every random number.
+        """
+    if not common_random_numbers:
+        rng = np.random.default_rng(seed)
+        return {name: rng for name in STREAMS}
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return {name: np.random.default_rng(np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key + (i,)))
+            for i, name in enumerate(STREAMS)}
+
+
+def get_bayesian_update_factor(old_price, new_price):
+    """TODO: discuss math behind this."""
+    return (old_price*(1-new_price))/(new_price*(1-old_price))
+
+
+def learn_from_market(market):
+    """Updates the beliefs of the agents. The prices are clipped to
+    [TICK_SIZE, 1 - TICK_SIZE], the market maker can drive them to 0 or 1.
+
+    >>> market = Market(2, 0.3, 0.3, 100)
+    >>> market.old_market_price, market.market_price = 0.5, 1.0
+    >>> learn_from_market(market)
+    >>> 0 < market.all_agents[0].belief < 1
+    True
+    """
+    if market.market_price == None or market.old_market_price == None:
+        return
+    old_price = min(max(market.old_market_price, TICK_SIZE), 1 - TICK_SIZE)
+    new_price = min(max(market.market_price, TICK_SIZE), 1 - TICK_SIZE)
+    bayes_factor = get_bayesian_update_factor(old_price, new_price)
+    if market.population is not None:
+        market.population.update_belief_given_market(bayes_factor)
+        return
+    for i in range(0, len(market.all_agents)):
+        market.all_agents[i].update_belief_given_market(bayes_factor)
+
+
+class Simulation:
+    """ Class representing a single run of the prediction market.
+
+    Attributes:
+        streams: Dictionary name -> numpy.random.Generator of the random
+            STREAMS of the run, see random_streams.
+        rng: numpy.random.Generator drawing the order of the agents.
+        clock: Iterator yielding the TIME values of the bids, in order.
+        max_iter: Number of cycles of the market.
+        evidence_time: Number of cycles during which evidence is provided.
+        iters_per_evidence: Number of cycles between two pieces of evidence.
+        n_receiving_evidence: Number of agents receiving every piece of evidence.
+        god: The God distributing evidence.
+        market: The Market the agents trade in.
+        book: The OrderBook holding the bids of the agents.
+        iteration: Number of completed market cycles.
+        price_history: Market price at the end of every cycle.
+        god_history: God's belief at the end of every cycle.
+        clearing: 'continuous' to match the bids after every agent,
+            'call' to clear the market once per cycle with a call auction.
+        market_maker: The LMSRMarketMaker the agents trade against, None
+            if they trade with each other through the book.
+        two_phase: If True every cycle is split in two phases: all the
+            agents compute their bids at once from a snapshot of the top
+            of the book and of the market price, then the bids are placed
+            in random order and matched in a single pass.
+        requote: If True every agent cancels its Bids resting in the book
+            before placing its new Bids, instead of letting them rest.
+    """
+
+    def __init__(self, n_agents, max_iter, n_evidence, fraction_receiving_evidence, fraction_extra_time,
+                 risk_factor, trust, wealth, seed=None, population=False, log_odds=False, clearing="continuous",
+                 mechanism="cda", liquidity=20, two_phase=False, order_ttl=None, max_orders_per_agent=None,
+                 requote=False, escrow=False, p_AgivenE=0.6, common_random_numbers=False):
+        """ Initialize the simulation.
+
+        Args:
+            n_agents: Number of agents participating in the market.
+            max_iter: Number of cycles of the market.
+            n_evidence: How many times a piece of information is shared.
+            fraction_receiving_evidence: Fraction of agents receiving every
+                piece of information.
+            fraction_extra_time: Fraction of the cycles the agents keep on
+                trading after the last piece of information.
+            risk_factor: See Agent.risk_factor.
+            trust: See Agent.trust.
+            wealth: Units of currency every agent is initialized with.
+            seed: Seed of the random generator, anything accepted by
+                numpy.random.default_rng. None draws fresh entropy.
+            population: If True the agents are stored in an AgentPopulation.
+            log_odds: If True the beliefs are stored as log-odds.
+            clearing: 'continuous' or 'call', see Simulation.clearing.
+            mechanism: 'cda' for the double auction through the order book,
+                'lmsr' to trade against an LMSR market maker.
+            liquidity: Liquidity parameter b of the LMSR market maker.
+            two_phase: See Simulation.two_phase.
+            order_ttl: See OrderBook.order_ttl.
+            max_orders_per_agent: See OrderBook.max_orders_per_agent.
+            requote: See Simulation.requote.
+            escrow: If True the order book holds the funds backing every
+                Bid in an Escrow.
+            p_AgivenE: Likelihood of the evidence A given the event E,
+                see God. The closer to 1, the more informative the evidence.
+            common_random_numbers: If True the beliefs, the evidence, its
+                recipients and the order of the agents are drawn from
+                separate streams, see random_streams.
+        """
+        if clearing not in ("continuous", "call"):
+            raise ValueError("Invalid clearing mode: {}".format(clearing))
+        if mechanism not in ("cda", "lmsr"):
+            raise ValueError("Invalid market mechanism: {}".format(mechanism))
+        self.streams = random_streams(seed, common_random_numbers)
+        self.rng = self.streams["ordering"]
+        self.clock = itertools.count()
+        self.max_iter = max_iter
+        self.evidence_time = int((1-fraction_extra_time)*max_iter)
+        self.iters_per_evidence = np.round(self.evidence_time/n_evidence)
+        self.n_receiving_evidence = int(n_agents * fraction_receiving_evidence)
+
+        # We use this object to distribute evidence,
+        # and maintain the complete bayesian probability.
+        self.god = God(p_AgivenE, 1-p_AgivenE, n_agents, rng=self.streams["evidence"], log_odds=log_odds,
+                       recipients_rng=self.streams["recipients"])
+        self.market = Market(n_agents, risk_factor, trust, wealth, belief_random=True,
+                             population=population, log_odds=log_odds, rng=self.streams["beliefs"])
+        self.book = OrderBook(self.clock, order_ttl, max_orders_per_agent,
+                              Escrow(self.market) if escrow else None)
+        self.clearing = clearing
+        self.market_maker = LMSRMarketMaker(liquidity) if mechanism == "lmsr" else None
+        self.two_phase = two_phase
+        self.requote = requote
+
+        self.iteration = 0
+        self.price_history = []
+        self.god_history = []
+
+    def step(self):
+        """Performs a single cycle of the market."""
+        # Allow for extra time after evidence to just trade.
+        if self.iteration < self.evidence_time:
+            if self.iteration % self.iters_per_evidence == 0:
+                # All agents learn from recent changes in market price.
+                learn_from_market(self.market)
+                self.market.old_market_price = self.market.market_price
+
+                self.god.update_universe(self.market, self.n_receiving_evidence)
+
+        self.book.start_cycle()                                                                 # Evict the expired Bids.
+        if self.two_phase and self.market_maker is None:
+            self.two_phase_step()
+        else:
+            self.sequential_step()
+
+        self.price_history.append(self.market.market_price)
+        self.god_history.append(self.god.belief)
+        self.iteration += 1
+
+    def sequential_step(self):
+        """Lets every agent in turn place its bids, reading the live book."""
+        for agent_id in self.rng.permutation(len(self.market.all_agents)):
+            if self.market_maker is not None:
+                self.market_maker.trade(self.market, agent_id)
+                continue
+            a = self.market.all_agents[agent_id]
+            if self.requote:
+                self.book.cancel_all(agent_id)
+
+            # Place bids for or against the event outcome.
+            a.for_main(self.book, self.market.market_price)
+            a.against_main(self.book, self.market.market_price)
+
+            # Trade contracts if possible.
+            if self.clearing == "continuous":
+                transact(self.book, self.market)
+
+        # Clear the market once all the agents have placed their bids.
+        if self.clearing == "call" and self.market_maker is None:
+            clear_call_auction(self.book, self.market)
+
+    def agent_arrays(self):
+        """Returns the arrays of belief, risk_factor, wealth, n_contracts_for
+        and n_contracts_against of all the agents."""
+        population = self.market.population
+        if population is not None:
+            return (population.belief, population.risk_factor, population.wealth,
+                    population.n_contracts_for, population.n_contracts_against)
+        agents = self.market.all_agents
+        return (np.array([a.belief for a in agents]), np.array([a.risk_factor for a in agents]),
+                np.array([a.wealth for a in agents]), np.array([a.n_contracts_for for a in agents]),
+                np.array([a.n_contracts_against for a in agents]))
+
+    def two_phase_step(self):
+        """Computes the bids of all the agents from a snapshot of the market,
+        then places them in random order and matches them once."""
+        # Phase 1: every agent decides its bids, a pure function of the snapshot.
+        belief, risk_factor, wealth, n_contracts_for, n_contracts_against = self.agent_arrays()
+        best_for = np.full(len(belief), book_top_price(self.book.best_for()))
+        best_against = np.full(len(belief), book_top_price(self.book.best_against()))
+        market_price = self.market.market_price
+        for_price, n_for = quote(belief, risk_factor, wealth, n_contracts_against, best_for, best_against, market_price)
+        against_price, n_against = quote(1-belief, risk_factor, wealth, n_contracts_for, best_against, best_for, 1-market_price)
+
+        # Phase 2: place the bids and match them in a single pass.
+        for agent_id in self.rng.permutation(len(self.market.all_agents)):
+            if self.requote:
+                self.book.cancel_all(agent_id)
+            if n_for[agent_id] > 0 or n_against[agent_id] > 0:
+                a = self.market.all_agents[agent_id]
+                if n_for[agent_id] > 0:
+                    a.place_bid_for(self.book, for_price.item(agent_id), n_for.item(agent_id))
+                if n_against[agent_id] > 0:
+                    a.place_bid_against(self.book, against_price.item(agent_id), n_against.item(agent_id))
+        if self.clearing == "call":
+            clear_call_auction(self.book, self.market)
+        else:
+            transact(self.book, self.market)
+
+    def run(self):
+        """Performs all the remaining cycles of the market.
+
+        Returns:
+            The price_history and god_history of the simulation.
+        """
+        while self.iteration < self.max_iter:
+            self.step()
+        return self.price_history, self.god_history
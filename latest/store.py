@@ -0,0 +1,121 @@
+# ============================================================
+# Prediction Market Simulation - History Store
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# The history store keeps the price and God's belief histories
+# of every replication of a sweep, so new metrics can be derived
+# without running the simulations again. It is partitioned by
+# parameter cell: every cell has its own directory holding its
+# parameters as JSON and one float32 .npy array per history,
+# replication x cycle. Queries only read the parameters, and the
+# arrays of the selected cells are memory-mapped.
+#
+# =============================================================
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from cache import to_json
+
+HISTORIES = ("price_history", "god_history")
+
+
+def partition_key(params):
+    """Returns the hexadecimal hash naming the partition of a cell."""
+    encoded = json.dumps(params, sort_keys=True, default=to_json)
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+
+def matches(params, conditions):
+    """Returns True if params satisfies every condition, see HistoryStore.select."""
+    for name, condition in conditions.items():
+        value = params.get(name)
+        if callable(condition):
+            if not condition(value):
+                return False
+        elif isinstance(condition, (list, tuple, set, frozenset)):
+            if value not in condition:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class HistoryStore:
+    """ Class representing a directory of the histories of a sweep.
+
+    Attributes:
+        directory: Path of the directory holding one partition per cell.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, params, price_history, god_history):
+        """Stores the histories of the replications of a cell, replacing
+        the ones stored for the same parameters.
+
+        Args:
+            params: Dictionary of the parameters of the cell.
+            price_history: Sequence of the market price histories of the
+                replications, all of the same length.
+            god_history: Sequence of God's belief histories of the
+                replications, all of the same length.
+
+        Returns:
+            The key of the partition.
+        """
+        key = partition_key(params)
+        temporary_path = tempfile.mkdtemp(dir=self.directory, suffix=".tmp")
+        np.save(os.path.join(temporary_path, "price_history.npy"), np.asarray(price_history, dtype=np.float32))
+        np.save(os.path.join(temporary_path, "god_history.npy"), np.asarray(god_history, dtype=np.float32))
+        with open(os.path.join(temporary_path, "params.json"), "w") as f:
+            json.dump(params, f, sort_keys=True, default=to_json)
+
+        path = os.path.join(self.directory, key)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(temporary_path, path)                                                         # Partitions appear complete or not at all.
+        return key
+
+    def keys(self):
+        """Returns the list of the keys of the stored partitions."""
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.exists(os.path.join(self.directory, name, "params.json")))
+
+    def params(self, key):
+        """Returns the dictionary of the parameters of a partition."""
+        with open(os.path.join(self.directory, key, "params.json")) as f:
+            return json.load(f)
+
+    def select(self, **conditions):
+        """Returns the keys of the partitions whose parameters satisfy
+        every condition, reading no history.
+
+        Every keyword names a parameter; its value is the value to match,
+        a list of accepted values or a predicate, e.g.
+        store.select(trust=[0, 0.5], n_agents=lambda n: n >= 100).
+        """
+        return [key for key in self.keys() if matches(self.params(key), conditions)]
+
+    def load(self, key, history="price_history", mmap=True):
+        """Returns the replication x cycle float32 array of a history of a
+        partition, memory-mapped unless mmap is False."""
+        if history not in HISTORIES:
+            raise ValueError("Invalid history: {}".format(history))
+        return np.load(os.path.join(self.directory, key, history + ".npy"), mmap_mode="r" if mmap else None)
+
+    def query(self, history="price_history", mmap=True, **conditions):
+        """Yields the (params, array) pair of every partition selected by
+        conditions, see select and load."""
+        for key in self.select(**conditions):
+            yield self.params(key), self.load(key, history, mmap)
@@ -0,0 +1,182 @@
+# ============================================================
+# Prediction Market Simulation - Parameter Sweep
+# ============================================================
+#
+# A number of agents participate concurrently in a market.
+# They are able to buy and sell contracts whichpay off in
+# case of either a positive ('for') or a negative ('against')
+# outcome of a particular event.
+#
+# The sweep runs several replications of the simulation for
+# every cell of a parameter grid, farming the (cell, replication)
+# jobs out to a pool of worker processes. Every job gets its
+# own seed, derived from the values of the cell rather than its
+# position in the grid, so the results don't depend on the
+# scheduling nor on the other cells of the grid. With a
+# ResultCache every result is stored as soon as it completes
+# and only the missing jobs are run. With common random numbers
+# replication k of every cell gets the same seed instead, so the
+# differences between cells are estimated with less variance.
+#
+# The adaptive sweep runs the replications of every cell in
+# batches, until the confidence interval of the mean of every
+# metric is narrower than a target.
+#
+# =============================================================
+
+import hashlib
+import json
+import math
+import os
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from cache import job_key, to_json
+
+
+def cell_seed(root_seed, cell, replication, common_random_numbers=False):
+    """Returns the SeedSequence of a replication of a cell, spawned from
+    root_seed under a key derived from the values of the cell, or only
+    from the replication with common random numbers."""
+    if common_random_numbers:
+        return np.random.SeedSequence(root_seed.entropy, spawn_key=root_seed.spawn_key + (replication,))
+    digest = hashlib.sha256(json.dumps(list(cell), default=to_json).encode()).digest()
+    cell_key = int.from_bytes(digest[:8], "little")
+    return np.random.SeedSequence(root_seed.entropy, spawn_key=root_seed.spawn_key + (cell_key, replication))
+
+
+def run_job(job):
+    """Runs a single (cell, replication) job in a worker process, storing
+    its result in the cache if there is one."""
+    function, args, cache, key = job
+    result = function(*args)
+    if cache is not None:
+        cache.store(key, result)
+    return result
+
+
+def make_job(function, cell, replication, root_seed, cache, common_random_numbers=False):
+    """Returns the job running a replication of a cell, see run_job."""
+    args = tuple(cell) + (cell_seed(root_seed, cell, replication, common_random_numbers),)
+    return function, args, cache, job_key(function, args) if cache is not None else None
+
+
+def run_jobs(jobs, n_workers=None):
+    """Runs jobs, loading the results already in their cache.
+
+    Returns:
+        The list of the results of the jobs, in order.
+    """
+    results = [None] * len(jobs)
+    pending = []
+    for i, (_, _, cache, key) in enumerate(jobs):
+        if cache is not None and key in cache:
+            results[i] = cache.load(key)
+        else:
+            pending.append(i)
+    if not pending:
+        return results
+    if n_workers == 1:
+        pending_results = [run_job(jobs[i]) for i in pending]
+    else:
+        n_workers = n_workers or os.cpu_count()
+        chunksize = max(1, len(pending) // (4 * n_workers))
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            pending_results = list(executor.map(run_job, [jobs[i] for i in pending], chunksize=chunksize))
+    for i, result in zip(pending, pending_results):
+        results[i] = result
+    return results
+
+
+def run_sweep(function, cells, n_replications, n_workers=None, seed=None, cache=None, common_random_numbers=False):
+    """Runs function n_replications times for every cell of parameters.
+
+    Args:
+        function: Picklable function running a single replication,
+            called as function(*cell, seed) where seed is an independent
+            numpy.random.SeedSequence for every job.
+        cells: List of tuples of positional arguments for function.
+        n_replications: Number of replications of every cell.
+        n_workers: Number of worker processes, None to use one per core
+            and 1 to run every job in the calling process.
+        seed: Root seed of the SeedSequence the job seeds are spawned
+            from. The results don't depend on n_workers.
+        cache: ResultCache storing the result of every job, None not to
+            store them. Without a seed the root entropy recorded in the
+            cache is used, so a rerun reuses the stored results.
+        common_random_numbers: If True replication k of every cell gets
+            the same seed. function should then draw its random numbers
+            from separate streams, see simulation.random_streams.
+
+    Returns:
+        A list with, for every cell in order, the list of the results
+            of its replications in order.
+    """
+    if cache is not None:
+        seed = cache.root_seed(seed)
+    root_seed = np.random.SeedSequence(seed)
+    jobs = [make_job(function, cell, replication, root_seed, cache, common_random_numbers)
+            for cell in cells for replication in range(n_replications)]
+    results = run_jobs(jobs, n_workers)
+    return [results[i:i + n_replications] for i in range(0, len(results), n_replications)]
+
+
+def half_widths(values, confidence):
+    """Returns the half-width of the normal confidence interval of the
+    mean of every column of values, infinite for less than 2 rows."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return np.full(values.shape[1:], np.inf)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    return z * values.std(axis=0, ddof=1) / math.sqrt(len(values))
+
+
+def run_adaptive_sweep(function, cells, metrics, half_width, min_replications=5, max_replications=100,
+                       confidence=0.95, n_workers=None, seed=None, cache=None, common_random_numbers=False):
+    """Runs function for every cell of parameters until the confidence
+    interval of the mean of every metric is narrower than 2 * half_width.
+
+    Every cell starts with min_replications replications. After each
+    batch the cells still too wide get the number of replications the
+    current standard deviation predicts they need, at least
+    min_replications more and at most max_replications. The replications
+    and their seeds are the ones run_sweep would run.
+
+    Args:
+        function, cells, n_workers, seed, cache, common_random_numbers:
+            See run_sweep.
+        metrics: Function mapping the result of a replication to the
+            tuple of the metrics whose mean is estimated.
+        half_width: Target half-width of the confidence intervals.
+        min_replications: Number of replications of every cell.
+        max_replications: Maximum number of replications of a cell.
+        confidence: Confidence level of the intervals.
+
+    Returns:
+        A list with, for every cell in order, the list of the results
+            of its replications in order.
+    """
+    if cache is not None:
+        seed = cache.root_seed(seed)
+    root_seed = np.random.SeedSequence(seed)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    all_results = [[] for _ in cells]
+    targets = [min(min_replications, max_replications)] * len(cells)
+    while True:
+        batch = [(i, replication) for i, cell in enumerate(cells)
+                 for replication in range(len(all_results[i]), targets[i])]
+        if not batch:
+            return all_results
+        jobs = [make_job(function, cells[i], replication, root_seed, cache, common_random_numbers)
+                for i, replication in batch]
+        for (i, _), result in zip(batch, run_jobs(jobs, n_workers)):
+            all_results[i].append(result)
+
+        for i, cell_results in enumerate(all_results):
+            n = len(cell_results)
+            values = [metrics(result) for result in cell_results]
+            if n >= max_replications or np.all(half_widths(values, confidence) <= half_width):
+                continue
+            std = np.asarray(values, dtype=np.float64).std(axis=0, ddof=1).max() if n > 1 else np.inf
+            n_needed = math.ceil((z * std / half_width) ** 2) if np.isfinite(std) else max_replications
+            targets[i] = min(max(n_needed, n + min_replications), max_replications)
@@ -3,175 +3,71 @@ Test script to determine relationship
 between parameters and correlation of market 
 price and 'True Probability'.
 
-Usage: python3 test.py
+Usage: python3 test.py [-h] [-j NUM_WORKERS] [-s SEED] [-c CACHE_DIR]
+                       [-H HISTORY_DIR] [-a HALF_WIDTH] [-m MIN_REPLICATIONS]
+                       [-M MAX_REPLICATIONS] [-D {grid,lhs,sobol}] [-N NUM_POINTS]
+                       [-R]
 
-Output: ./results.csv
+Output: ./results.csv, and the histories of every replication in HISTORY_DIR
 """
 
 import numpy as np
-import random
-import heapq
 import argparse
-import pandas as pd      
-import matplotlib.pyplot as plt
-import time
-from god import God
-from market import Market
+from cache import ResultCache
+from engine import SimulationParams, run_simulation
+from store import HistoryStore
+from sampling import latin_hypercube, scale, sobol
+from sweep import run_adaptive_sweep, run_sweep
 
-    
-def get_older_price(bid_for, bid_against):
-    """Returns the price of the most recent transaction."""
-    if bid_for.age < bid_for.age:
-        return bid_for.price
-    else:
-        return 1 - bid_against.price
-    
-def transact(bids_for, bids_against, market):
-    """Performs transactions.
-
-    Recursevly resolves all the bids for contracts stacked by the agents.
-
-    Args:
-        bids_for: List of bids for contracts paying for positive outcome.
-        bids_against: List of bids for contracts paying for negative outcome.
-        market: The Market object to perform the transactions in.
-    """
-    if bids_for == [] or bids_against == []:
-        return
-    
-    highest_bid_for = heapq.nsmallest(1, bids_for)[0]
-    highest_bid_against = heapq.nsmallest(1, bids_against)[0]
-    
-    # Removes the bid if the agent can't pay.
-    if market.is_broke(highest_bid_for.agent_id, highest_bid_for.price, "FOR"):
-        heapq.heappop(bids_for)
-        transact(bids_for, bids_against, market)
-        return
-
-    # Removes the bid if the agent can't pay.
-    if market.is_broke(highest_bid_against.agent_id, highest_bid_against.price, "AGAINST"):
-        heapq.heappop(bids_against)
-        transact(bids_for, bids_against, market)
-        return
-    
-    if(highest_bid_for.price + highest_bid_against.price >= 1):
-        bid_for = heapq.heappop(bids_for)
-        bid_against = heapq.heappop(bids_against)
-        
-        # Market price becomes the price of the most recent transaction.
-        market_price = get_older_price(bid_for, bid_against)
-
-        # Resolve transactions.
-        market.buy_for(bid_for.agent_id, market_price)
-        market.buy_against(bid_against.agent_id, market_price)
-        
-        # Sets the new market price
-        market.market_price = market_price
-        transact(bids_for, bids_against, market)
-    else:
-        return
-        
-def get_bayesian_update_factor(old_price, new_price, N_AGENTS):
-    """TODO: discuss math behind this."""
-    return (old_price*(1-new_price))/(new_price*(1-old_price))
-    
-def learn_from_market(market):
-    """Updates the beliefs of the agents."""
-    if market.market_price == None or market.old_market_price == None:
-        return
-    bayes_factor = get_bayesian_update_factor(market.old_market_price, market.market_price, len(market.all_agents))
-    for i in range(0, len(market.all_agents)):
-        market.all_agents[i].update_belief_given_market(bayes_factor)
-
-def plot_dynamic(x, y, fig, ax, color):
-    """Visualize results updating in real-time.
-    
-    Args:
-        x: List of index of the N completed market cycles [0, 1, ..., N-1].
-        y: List of market prices at the end each cycle.
-        fig: Reference to a matplotlib.figure.Figure object, 
-            e.g. fig = matplotlib.pyplot.figure().
-        ax: Reference to the axes of the plot, 
-            e.g. ax = matplotlib.pyplot.gca()
-            or
-            fig, ax = matplotlib.pyplot.subplots()
-        color: str color for the plot.
-    """
-    ax.plot(x, y, color)
-    plt.legend(['Market Price', 'True Bayesian Probability', 'Agent 0 Belief'])
-    plt.xlabel("Iterations (Market Cycles)")
-    plt.ylabel("Price")
-    fig.canvas.draw()
-    plt.pause(1e-17)
-    time.sleep(0.00001)
 
+def cell_params(N_AGENTS, MAX_ITER, N_EVIDENCE, FRACTION_RECEIVING_EVIDENCE, FRACTION_EXTRA_TIME, RISK_FACTOR, TRUST, WEALTH, P_AGIVENE, COMMON_RANDOM_NUMBERS):
+    """Returns the SimulationParams of a cell of the sweep."""
+    return SimulationParams(N_AGENTS, MAX_ITER, N_EVIDENCE, FRACTION_RECEIVING_EVIDENCE, FRACTION_EXTRA_TIME, RISK_FACTOR, TRUST, WEALTH,
+                            p_AgivenE=P_AGIVENE, common_random_numbers=COMMON_RANDOM_NUMBERS)
 
+def test(N_AGENTS, MAX_ITER, N_EVIDENCE, FRACTION_RECEIVING_EVIDENCE, FRACTION_EXTRA_TIME, RISK_FACTOR, TRUST, WEALTH, P_AGIVENE, COMMON_RANDOM_NUMBERS, SEED=None):
+    """Main cycle from 'run.py'.
 
-def test(N_AGENTS, MAX_ITER, N_EVIDENCE, FRACTION_RECEIVING_EVIDENCE, FRACTION_EXTRA_TIME, RISK_FACTOR, TRUST, WEALTH):
-    """Main cycle from 'run.py'."""
-
-    EVIDENCE_TIME = int((1-FRACTION_EXTRA_TIME)*MAX_ITER)   # Number of cycles the agents keep on trading after all the evidence has been provided.
-
-    # Exit the program if user inputs invalid arguments.
-    if (RISK_FACTOR <= 0.0):
-        print("Error: Invalid Argument for RISK_FACTOR: must be more than 0.0.")
-        exit()
-    if (TRUST > 1.0 or TRUST < 0.0):
-        print("Error: Invalid Argument for TRUST: must be in range [0.0, 1.0].")
-        exit()
-
-    # We use this object to distribute evidence, 
-    # and maintain the complete bayesian probability.
-    the_almighty = God(0.6, 1-0.6, N_AGENTS) # TODO explain why 0.6 or put in an argument
-    
-    iters_per_evidence = np.round(EVIDENCE_TIME/N_EVIDENCE)
-    
-    market = Market(N_AGENTS, RISK_FACTOR, TRUST, WEALTH, belief_random=True)
-
-    bids_against = []
-    heapq.heapify(bids_against)
-    bids_for = []
-    heapq.heapify(bids_against)
+    Returns:
+        The correlation of market price and 'True Probability' over
+            the run, and their difference at the end of it.
+    """
+    params = cell_params(N_AGENTS, MAX_ITER, N_EVIDENCE, FRACTION_RECEIVING_EVIDENCE, FRACTION_EXTRA_TIME, RISK_FACTOR, TRUST, WEALTH, P_AGIVENE, COMMON_RANDOM_NUMBERS)
+    result = run_simulation(params, seed=SEED)
+    return result.correlation, result.difference
 
-    price_history = []
-    god_history = []
-    agent_0_history = []
+def test_histories(N_AGENTS, MAX_ITER, N_EVIDENCE, FRACTION_RECEIVING_EVIDENCE, FRACTION_EXTRA_TIME, RISK_FACTOR, TRUST, WEALTH, P_AGIVENE, COMMON_RANDOM_NUMBERS, SEED=None):
+    """Runs 'test', keeping the histories.
 
-    
+    Returns:
+        The correlation, the difference, and the float32 arrays of the
+            market price and 'True Probability' at every cycle.
+    """
+    params = cell_params(N_AGENTS, MAX_ITER, N_EVIDENCE, FRACTION_RECEIVING_EVIDENCE, FRACTION_EXTRA_TIME, RISK_FACTOR, TRUST, WEALTH, P_AGIVENE, COMMON_RANDOM_NUMBERS)
+    result = run_simulation(params, seed=SEED)
+    return (result.correlation, result.difference,
+            np.asarray(result.price_history, dtype=np.float32), np.asarray(result.god_history, dtype=np.float32))
 
-    for i in range(0, MAX_ITER):
-        # Allow for extra time after evidence to just trade.
-        if i < EVIDENCE_TIME:
-            if i%iters_per_evidence == 0:
-                # All agents learn from recent changes in market price.
-                learn_from_market(market)
-                market.old_market_price = market.market_price
-                
-                the_almighty.update_universe(market, int(N_AGENTS * FRACTION_RECEIVING_EVIDENCE))     
-                #print("God has spoken!")
-        
-        all_agents = market.all_agents.copy()
-        random.shuffle(all_agents)
-        for a in all_agents:
-            
-            # Place bids for or against the event outcome.
-            a.for_main(bids_for, bids_against, market.market_price) 
-            a.against_main(bids_for, bids_against, market.market_price)  
-            
-            # Trade contracts if possible.
-            transact(bids_for, bids_against, market)
-        
-        price_history.append(market.market_price)
-        god_history.append(the_almighty.belief)
-
-        agent_0_history.append(all_agents[0].belief)
-
-
-    return np.corrcoef(price_history, god_history) , (the_almighty.belief - market.market_price)
+def replication_metrics(result):
+    """Returns the correlation and the absolute difference of a replication."""
+    return result[0], np.abs(result[1])
 
 def main():
     """Cycles through every combination of the specified parameters parameters"""
 
+    parser = argparse.ArgumentParser(description='Parameter sweep of the Prediction Market simulation.')
+    parser.add_argument('-j', metavar="num_workers", default=None, type=int, help='The number of worker processes running the replications (default: one per core).')
+    parser.add_argument('-s', metavar="seed",        default=None, type=int, help='Seed from which the seed of every replication is derived (default: fresh entropy).')
+    parser.add_argument('-c', metavar="cache_dir",   default=None,           help='Directory storing the result of every replication as soon as it completes; a rerun with the same seed, or with no seed, only runs the missing ones (default: no cache).')
+    parser.add_argument('-H', metavar="history_dir", default=None,           help='Directory storing the price and God histories of every replication, partitioned by cell (default: not stored).')
+    parser.add_argument('-a', metavar="half_width",  default=None, type=float, help='Run replications of every cell until the 95%% confidence intervals of the mean correlation and difference are narrower than +/- half_width (default: 25 replications per cell).')
+    parser.add_argument('-m', metavar="min_replications", default=5, type=int,  help='Number of replications every cell starts with in the adaptive mode (default: 5).')
+    parser.add_argument('-M', metavar="max_replications", default=100, type=int, help='Maximum number of replications of a cell in the adaptive mode (default: 100).')
+    parser.add_argument('-D', choices=["grid", "lhs", "sobol"], default="grid", help='Sweep the grid below, or sample the ranges below with a Latin hypercube or a Sobol sequence (default: grid).')
+    parser.add_argument('-N', metavar="num_points",  default=256,  type=int,   help='Number of points of the lhs and sobol designs, preferably a power of 2 for sobol, which skips the origin and takes the next num_points points (default: 256).')
+    parser.add_argument('-R', action="store_true",                         help='Use common random numbers: replication k of every cell draws the same initial beliefs, evidence, recipients and agent order.')
+    args = parser.parse_args()
+
     ## Full Version
     # test_agents = [50, 100]
     # test_iters = [50, 100, 200, 300]
@@ -187,6 +83,44 @@ def main():
     test_fraction = [0.25, 0.50, 0.75]
     test_trust = [0, 0.5, 1]
     test_risk = [1]
+    test_p_AgivenE = [0.6]
+
+    # Ranges of the space-filling designs, the other parameters are fixed.
+    design_fraction = (0.1, 0.75)
+    design_trust = (0, 1)
+    design_risk = (0.1, 1.5)
+    design_p_AgivenE = (0.55, 0.9)
+
+    cells = []
+    if args.D == "grid":
+        for n_agents in test_agents:
+            for n_iters in test_iters:
+                for n_evidence in test_evidence:
+                    for fraction in test_fraction:
+                        for trust in test_trust:
+                            for risk in test_risk:
+                                for p_AgivenE in test_p_AgivenE:
+                                    cells.append((n_agents, n_iters, n_evidence, fraction, 0.1, risk, trust, 100, p_AgivenE, args.R))
+    else:
+        if args.D == "lhs":
+            points = latin_hypercube(args.N, 4, np.random.default_rng(args.s))
+        else:
+            points = sobol(args.N, 4, skip=1)                   # The first point of the sequence is the corner of the box.
+        for fraction, trust, risk, p_AgivenE in scale(points, [design_fraction, design_trust, design_risk, design_p_AgivenE]):
+            cells.append((100, 100, 20, float(fraction), 0.1, float(risk), float(trust), 100, float(p_AgivenE), args.R))
+    cache = ResultCache(args.c) if args.c is not None else None
+    function = test_histories if args.H is not None else test
+    if args.a is not None:
+        all_results = run_adaptive_sweep(function, cells, replication_metrics, args.a, args.m, args.M,
+                                         n_workers=args.j, seed=args.s, cache=cache, common_random_numbers=args.R)
+    else:
+        all_results = run_sweep(function, cells, 25, n_workers=args.j, seed=args.s, cache=cache, common_random_numbers=args.R)
+
+    if args.H is not None:
+        store = HistoryStore(args.H)
+        for cell, cell_results in zip(cells, all_results):
+            store.write(cell_params(*cell)._asdict(),
+                        [result[2] for result in cell_results], [result[3] for result in cell_results])
 
     history_agents = []
     history_iters = []
@@ -194,37 +128,39 @@ def main():
     history_fraction = []
     history_trust = []
     history_risk = []
+    history_p_AgivenE = []
     history_diff = []
     history_corr = []
-    for n_agents in test_agents:
-        for n_iters in test_iters:
-            for n_evidence in test_evidence:
-                for fraction in test_fraction:
-                    for trust in test_trust:
-                        for risk in test_risk:
-                            correlation = []
-                            difference = []
-                            for i in range(25):
-                                corr, diff = test(n_agents, n_iters, n_evidence, fraction, 0.1, risk, trust, 100)
-                                correlation.append(np.min(corr))
-                                difference.append(np.abs(diff))
-                            history_agents.append(n_agents)
-                            history_iters.append(n_iters)
-                            history_evidence.append(n_evidence)
-                            history_fraction.append(fraction)
-                            history_trust.append(trust)
-                            history_risk.append(risk)
-                            history_diff.append(np.average(difference))
-                            history_corr.append(np.average(correlation))
+    history_replications = []
+    for cell, cell_results in zip(cells, all_results):
+        n_agents, n_iters, n_evidence, fraction, _, risk, trust, _, p_AgivenE, _ = cell
+        correlation = []
+        difference = []
+        for corr, diff, *_ in cell_results:
+            correlation.append(corr)
+            difference.append(np.abs(diff))
+        history_agents.append(n_agents)
+        history_iters.append(n_iters)
+        history_evidence.append(n_evidence)
+        history_fraction.append(fraction)
+        history_trust.append(trust)
+        history_risk.append(risk)
+        history_p_AgivenE.append(p_AgivenE)
+        history_diff.append(np.average(difference))
+        history_corr.append(np.average(correlation))
+        history_replications.append(len(cell_results))
                             
+    import pandas as pd                                 # Only the main process writes the results.
     results = pd.DataFrame({"n_agents"                        : history_agents,
                   "n_iterations"                    : history_iters,
                   "n_evidence"                      : history_evidence,
                   "fraction receiving evidence"     : history_fraction,
                   "trust"                           : history_trust,
                   "risk"                            : history_risk,
+                  "p_AgivenE"                       : history_p_AgivenE,
                   "difference"                      : history_diff,
-                  "correlation"                     : history_corr
+                  "correlation"                     : history_corr,
+                  "n_replications"                  : history_replications
                   })
 
     results.to_csv("./results.csv")